@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the /projection maths
+Compares the batched NumPy calculation with a per-scenario Python loop
+(how the app's calculator works today) as the number of scenarios grows.
+
+Usage: python bench_projection.py [--subjects 10] [--repeat 20]
+"""
+import argparse
+import math
+import random
+import time
+
+from main import project_attendance
+
+
+def make_subjects(count: int) -> dict:
+    subjects = {}
+    for i in range(count):
+        total = random.randint(20, 60)
+        attended = random.randint(total // 2, total)
+        subjects[f"Subject {i + 1}"] = {
+            "total": total,
+            "attended": attended,
+            "percentage": round(attended * 100 / total, 2)
+        }
+    return subjects
+
+
+def project_loop(attendance_data: dict, thresholds: list, horizons: list) -> list:
+    """Reference implementation: one scenario at a time"""
+    results = []
+    for entry in attendance_data.values():
+        attended, total = entry["attended"], entry["total"]
+        for threshold in thresholds:
+            needed = max(math.ceil((threshold * total - attended * 100) / (100 - threshold) - 1e-9), 0)
+            safe = max(math.floor((attended * 100 - threshold * total) / threshold + 1e-9), 0)
+            for horizon in horizons:
+                skips = math.floor(attended + horizon - threshold * (total + horizon) / 100 + 1e-9)
+                results.append((needed, safe, -1 if skips < 0 else min(skips, horizon)))
+    return results
+
+
+def best_of(repeat: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subjects", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(1)
+    attendance_data = make_subjects(args.subjects)
+
+    print(f"{'thresholds':>10} {'horizons':>8} {'scenarios':>9} {'numpy ms':>9} {'loop ms':>8}")
+    for threshold_count, horizon_count in [(1, 4), (5, 10), (10, 20), (20, 50), (50, 100)]:
+        thresholds = [50 + 45 * i / threshold_count for i in range(threshold_count)]
+        horizons = list(range(1, horizon_count + 1))
+        scenarios = (args.subjects + 1) * threshold_count * horizon_count
+
+        # Both implementations must agree before timing them
+        batched = project_attendance(attendance_data, thresholds, horizons)
+        loop = project_loop(attendance_data, thresholds, horizons)
+        flat = [
+            (batched["classes_needed"][s][t], batched["safe_to_skip"][s][t], batched["max_skips_in_horizon"][s][t][h])
+            for s in range(args.subjects) for t in range(threshold_count) for h in range(horizon_count)
+        ]
+        assert flat == loop, "NumPy and loop results differ"
+
+        numpy_ms = best_of(args.repeat, project_attendance, attendance_data, thresholds, horizons)
+        loop_ms = best_of(args.repeat, project_loop, attendance_data, thresholds, horizons)
+        print(f"{threshold_count:>10} {horizon_count:>8} {scenarios:>9} {numpy_ms:>9.3f} {loop_ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
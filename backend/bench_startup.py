@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for eco dyno cold starts
+Reports the import time of main.py, time until the server answers /health,
+and (with credentials) time to the first successful scrape.
+
+Usage:
+    python bench_startup.py [--runs 5] [--prewarm]
+    ATTENDANCE_USERNAME=... ATTENDANCE_PASSWORD=... python bench_startup.py --prewarm
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def measure_import(runs: int) -> list:
+    """Import main.py in fresh interpreters, like a dyno waking up"""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def request_json(url: str, body: dict = None, timeout: float = 30):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def measure_boot(port: int, prewarm: bool, username: str, password: str, institution_type: str) -> dict:
+    """Start uvicorn, wait for /health, then run one scrape if credentials were given"""
+    env = dict(os.environ, PREWARM_PORTALS="1" if prewarm else "0")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--workers", "1"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    result = {}
+    try:
+        while True:
+            try:
+                request_json(f"{base_url}/health", timeout=1)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if server.poll() is not None:
+                    raise RuntimeError("Server exited during startup")
+                if time.perf_counter() - started > 60:
+                    raise RuntimeError("Server did not become healthy within 60s")
+                time.sleep(0.02)
+        result["healthy_ms"] = (time.perf_counter() - started) * 1000
+
+        if username and password:
+            if prewarm:
+                # Give the background prewarm a moment, as the wake-up request would
+                time.sleep(1)
+            scrape_started = time.perf_counter()
+            response = request_json(f"{base_url}/login-and-fetch-attendance", {
+                "college_id": username,
+                "password": password,
+                "institution_type": institution_type,
+            })
+            result["scrape_ms"] = (time.perf_counter() - scrape_started) * 1000
+            result["first_scrape_ms"] = (time.perf_counter() - started) * 1000
+            result["scrape_success"] = response.get("success")
+
+        result["startup_info"] = request_json(f"{base_url}/health").get("startup_info")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for the import timing")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--prewarm", action="store_true", help="boot with PREWARM_PORTALS=1")
+    parser.add_argument("--institution-type", default="college")
+    args = parser.parse_args()
+
+    timings = measure_import(args.runs)
+    print(f"import main: median {statistics.median(timings):.1f}ms "
+          f"(min {min(timings):.1f}ms, max {max(timings):.1f}ms, {args.runs} runs)")
+
+    boot = measure_boot(
+        args.port, args.prewarm,
+        os.environ.get("ATTENDANCE_USERNAME"), os.environ.get("ATTENDANCE_PASSWORD"),
+        args.institution_type
+    )
+    print(f"process start -> /health: {boot['healthy_ms']:.1f}ms")
+    if "scrape_ms" in boot:
+        print(f"first scrape: {boot['scrape_ms']:.1f}ms (success={boot['scrape_success']}), "
+              f"process start -> first scrape done: {boot['first_scrape_ms']:.1f}ms")
+    else:
+        print("first scrape: skipped (set ATTENDANCE_USERNAME and ATTENDANCE_PASSWORD)")
+    print(f"server startup_info: {json.dumps(boot['startup_info'])}")
+
+
+if __name__ == "__main__":
+    main()
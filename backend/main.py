@@ -1,27 +1,186 @@
-import certifi
-import os
-os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
+import time
+MODULE_IMPORT_STARTED = time.perf_counter()
 
-from fastapi import FastAPI, HTTPException
+import os
+import importlib
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import requests
-from bs4 import BeautifulSoup
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import json
-from typing import Dict, Any, Optional
-import uvicorn
+from typing import Dict, Any, Optional, List
 import hashlib
+import hmac
+import heapq
+import asyncio
+import sys
+import struct
+import zlib
+from array import array
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import BrokenExecutor
+from contextlib import asynccontextmanager
+
+class LazyModule:
+    """
+    Stand-in for a heavy module that is only imported on first attribute access
+    Keeps eco dyno cold starts from paying for requests/BeautifulSoup up front
+    """
+
+    def __init__(self, name: str, before_import=None):
+        self._name = name
+        self._before_import = before_import
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            if self._before_import is not None:
+                self._before_import()
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+def use_certifi_bundle() -> None:
+    import certifi
+    os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
+
+requests = LazyModule('requests', before_import=use_certifi_bundle)
+bs4 = LazyModule('bs4')
 
-app = FastAPI(title="College Attendance Scraper", version="1.0.0")
+router = APIRouter()
 
 # In-memory cache for attendance data (optimized for Heroku)
 attendance_cache = {}
 datewise_cache = {}
 tilldate_cache = {}
+index_cache = {}
 CACHE_DURATION_HOURS = 6
 
+# Date format used by the portal's per-lecture rows, e.g. "05 Aug 2025"
+PORTAL_DATE_FORMAT = '%d %b %Y'
+
+class CompactDatewise:
+    """
+    Packed form of a date-wise history for datewise_cache.
+    Subject names and statuses live in interned lookup tables, dates are day
+    numbers, and each lecture is a subject index plus a status byte. The
+    [{'date': ..., 'data': [{subject: status}, ...]}, ...] shape is only
+    rebuilt when a response is sent.
+    """
+
+    __slots__ = ('subjects', 'statuses', 'days', 'dates', 'offsets', 'subject_codes', 'status_codes')
+
+    def __init__(self, subjects, statuses, days, dates, offsets, subject_codes, status_codes):
+        self.subjects = subjects          # tuple of interned subject names
+        self.statuses = statuses          # tuple of interned status strings ('P', 'A', ...)
+        self.days = days                  # array('i') of date ordinals, or None
+        self.dates = dates                # tuple of raw date strings when they don't round-trip
+        self.offsets = offsets            # array('I'): lectures of date i are offsets[i]:offsets[i+1]
+        self.subject_codes = subject_codes  # array('H') index into subjects per lecture
+        self.status_codes = status_codes    # bytes, index into statuses per lecture
+
+    @classmethod
+    def encode(cls, forward: list) -> Optional['CompactDatewise']:
+        """Pack a forward date-wise list; returns None if it isn't in the expected shape"""
+        subject_table = {}
+        status_table = {}
+        date_strings = []
+        offsets = array('I', [0])
+        subject_codes = array('H')
+        status_codes = bytearray()
+
+        for entry in forward:
+            date_strings.append(entry['date'])
+            for lecture in entry['data']:
+                if len(lecture) != 1:
+                    return None
+                (subject, status), = lecture.items()
+                if subject not in subject_table:
+                    subject_table[subject] = len(subject_table)
+                if status not in status_table:
+                    status_table[status] = len(status_table)
+                subject_codes.append(subject_table[subject])
+                status_codes.append(status_table[status])
+            offsets.append(len(subject_codes))
+
+        if len(subject_table) > 0xFFFF or len(status_table) > 0xFF:
+            return None
+
+        days = array('i')
+        for date_str in date_strings:
+            try:
+                day = datetime.strptime(date_str, PORTAL_DATE_FORMAT).date()
+            except ValueError:
+                days = None
+                break
+            # Only keep day numbers when they reproduce the portal's text exactly
+            if day.strftime(PORTAL_DATE_FORMAT) != date_str:
+                days = None
+                break
+            days.append(day.toordinal())
+
+        return cls(
+            subjects=tuple(sys.intern(subject) for subject in subject_table),
+            statuses=tuple(sys.intern(status) for status in status_table),
+            days=days,
+            dates=None if days is not None else tuple(date_strings),
+            offsets=offsets,
+            subject_codes=subject_codes,
+            status_codes=bytes(status_codes),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def date_at(self, index: int) -> str:
+        if self.days is not None:
+            return date.fromordinal(self.days[index]).strftime(PORTAL_DATE_FORMAT)
+        return self.dates[index]
+
+    def to_forward(self) -> list:
+        """Rebuild the forward date-wise list sent to the app"""
+        subjects = self.subjects
+        statuses = self.statuses
+        forward = []
+        for index in range(len(self)):
+            start, end = self.offsets[index], self.offsets[index + 1]
+            forward.append({
+                'date': self.date_at(index),
+                'data': [
+                    {subjects[subject]: statuses[status]}
+                    for subject, status in zip(self.subject_codes[start:end], self.status_codes[start:end])
+                ]
+            })
+        return forward
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this entry (shared interned strings excluded)"""
+        size = sys.getsizeof(self.offsets) + sys.getsizeof(self.subject_codes) + sys.getsizeof(self.status_codes)
+        size += sys.getsizeof(self.subjects) + sys.getsizeof(self.statuses)
+        if self.days is not None:
+            size += sys.getsizeof(self.days)
+        else:
+            size += sys.getsizeof(self.dates) + sum(sys.getsizeof(date_str) for date_str in self.dates)
+        return size
+
+def encode_cache_data(endpoint: str, data):
+    """Convert endpoint data to its in-cache representation"""
+    if endpoint == 'datewise':
+        # Only the forward list is stored; the reversed copy is rebuilt on read
+        compact = CompactDatewise.encode(data[0])
+        if compact is not None:
+            return compact
+    return data
+
+def decode_cache_data(endpoint: str, data):
+    """Convert cached data back to the endpoint's response shape"""
+    if isinstance(data, CompactDatewise):
+        forward = data.to_forward()
+        return [forward, forward[::-1]]
+    return data
+
 def get_cache_key(username: str, endpoint: str) -> str:
     """Generate a unique cache key for user and endpoint"""
     return hashlib.md5(f"{username}_{endpoint}".encode()).hexdigest()
@@ -34,52 +193,159 @@ def is_cache_valid(cache_entry: dict) -> bool:
     cache_time = datetime.fromisoformat(cache_entry['timestamp'])
     return datetime.now() - cache_time < timedelta(hours=CACHE_DURATION_HOURS)
 
-def get_cached_data(username: str, endpoint: str) -> Optional[dict]:
-    """Retrieve cached data if valid"""
-    cache_key = get_cache_key(username, endpoint)
-
+def get_cache_store(endpoint: str) -> Optional[dict]:
+    """Return the cache dict backing an endpoint"""
     if endpoint == 'attendance':
-        cache_store = attendance_cache
+        return attendance_cache
     elif endpoint == 'datewise':
-        cache_store = datewise_cache
+        return datewise_cache
     elif endpoint == 'tilldate':
-        cache_store = tilldate_cache
-    else:
+        return tilldate_cache
+    elif endpoint == 'index':
+        return index_cache
+    return None
+
+def get_cached_data(username: str, endpoint: str) -> Optional[dict]:
+    """Retrieve cached data if valid"""
+    cache_key = get_cache_key(username, endpoint)
+    cache_store = get_cache_store(endpoint)
+    if cache_store is None:
         return None
 
     if cache_key in cache_store and is_cache_valid(cache_store[cache_key]):
         print(f"✅ Serving cached data for {username} - {endpoint}")
-        return cache_store[cache_key]['data']
+        return decode_cache_data(endpoint, cache_store[cache_key]['data'])
 
     return None
 
+def get_stale_cached_data(username: str, endpoint: str) -> Optional[dict]:
+    """
+    Retrieve cached data regardless of age
+    Returns the raw cache entry (data + timestamp) so callers can report how old it is
+    """
+    cache_store = get_cache_store(endpoint)
+    if cache_store is None:
+        return None
+
+    entry = cache_store.get(get_cache_key(username, endpoint))
+    if entry is None:
+        return None
+
+    return {
+        'data': decode_cache_data(endpoint, entry['data']),
+        'timestamp': entry['timestamp']
+    }
+
 def set_cached_data(username: str, endpoint: str, data: dict) -> None:
     """Store data in cache with timestamp"""
     cache_key = get_cache_key(username, endpoint)
-
-    if endpoint == 'attendance':
-        cache_store = attendance_cache
-    elif endpoint == 'datewise':
-        cache_store = datewise_cache
-    elif endpoint == 'tilldate':
-        cache_store = tilldate_cache
-    else:
+    cache_store = get_cache_store(endpoint)
+    if cache_store is None:
         return
 
     cache_store[cache_key] = {
-        'data': data,
+        'data': encode_cache_data(endpoint, data),
         'timestamp': datetime.now().isoformat()
     }
     print(f"💾 Cached data for {username} - {endpoint}")
+    record_first_scrape()
+    publish_update(username, endpoint, data)
+
+# Short-lived negative cache for failed logins, so retries with the same wrong
+# password are answered locally instead of repeating three portal round trips.
+# Keys are salted hashes; plaintext credentials are never stored.
+FAILED_LOGIN_TTL_SECONDS = int(os.environ.get('FAILED_LOGIN_TTL_SECONDS', '300'))
+FAILED_LOGIN_MAX_ENTRIES = 10000
+FAILED_LOGIN_SALT = (os.environ.get('FAILED_LOGIN_SALT') or os.urandom(16).hex()).encode()
+failed_login_cache = {}
+failed_login_attempts = {}
+verified_logins = {}
+failed_login_stats = {
+    'hits': 0,
+}
+
+class InvalidCredentialsError(Exception):
+    """Raised when the portal rejects the credentials (or they belong to the other institution)"""
+
+    def __init__(self, message: str, cached: bool = False):
+        super().__init__(message)
+        self.cached = cached  # answered from failed_login_cache, not by the portal
+
+def get_credentials_key(username: str, password: str, institution_type: str) -> str:
+    """Salted hash of the full credentials and institution"""
+    message = "\0".join([institution_type, username, password]).encode()
+    return hmac.new(FAILED_LOGIN_SALT, message, hashlib.sha256).hexdigest()
+
+def get_user_key(username: str, institution_type: str) -> str:
+    """Salted hash of the user alone, for attempt counting"""
+    message = "\0".join([institution_type, username]).encode()
+    return hmac.new(FAILED_LOGIN_SALT, message, hashlib.sha256).hexdigest()
+
+def prune_failed_logins() -> None:
+    """Drop expired failures once the negative cache gets large"""
+    if len(failed_login_cache) < FAILED_LOGIN_MAX_ENTRIES:
+        return
 
-# Add CORS middleware to allow Flutter app to make requests
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins for development
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-)
+    now = time.monotonic()
+    for cache in (failed_login_cache, failed_login_attempts):
+        for key in [key for key, entry in cache.items() if entry['expires_at'] <= now]:
+            del cache[key]
+
+def get_failed_login(username: str, password: str, institution_type: str) -> Optional[InvalidCredentialsError]:
+    """Return the cached login failure for these exact credentials, if still fresh"""
+    key = get_credentials_key(username, password, institution_type)
+    entry = failed_login_cache.get(key)
+    if entry is None:
+        return None
+
+    if entry['expires_at'] <= time.monotonic():
+        del failed_login_cache[key]
+        return None
+
+    failed_login_stats['hits'] += 1
+    print(f"🚫 Serving cached login failure for {username}")
+    return InvalidCredentialsError(entry['error'], cached=True)
+
+def record_failed_login(username: str, password: str, institution_type: str, error: InvalidCredentialsError) -> None:
+    """
+    Remember a failed login and count the user's recent failed attempts
+    Cached failures are ignored and an existing entry is never extended, so retries
+    can't keep credentials locked out past the TTL
+    """
+    if error.cached:
+        return
+
+    prune_failed_logins()
+    now = time.monotonic()
+    expires_at = now + FAILED_LOGIN_TTL_SECONDS
+
+    key = get_credentials_key(username, password, institution_type)
+    entry = failed_login_cache.get(key)
+    if entry is None or entry['expires_at'] <= now:
+        failed_login_cache[key] = {
+            'error': str(error),
+            'expires_at': expires_at,
+        }
+
+    user_key = get_user_key(username, institution_type)
+    attempts = failed_login_attempts.get(user_key)
+    if attempts is None or attempts['expires_at'] <= time.monotonic():
+        attempts = {'count': 0}
+    attempts['count'] += 1
+    attempts['expires_at'] = expires_at
+    failed_login_attempts[user_key] = attempts
+    print(f"🚫 Login failed for {username} ({attempts['count']} failed attempts in the last {FAILED_LOGIN_TTL_SECONDS}s)")
+
+def record_successful_login(username: str, password: str, institution_type: str) -> None:
+    """Reset the user's attempt count and remember the credentials hash that worked"""
+    user_key = get_user_key(username, institution_type)
+    failed_login_attempts.pop(user_key, None)
+    verified_logins[user_key] = get_credentials_key(username, password, institution_type)
+
+def is_verified_login(username: str, password: str, institution_type: str) -> bool:
+    """True if these credentials last logged in to the portal successfully"""
+    expected = verified_logins.get(get_user_key(username, institution_type))
+    return expected is not None and hmac.compare_digest(expected, get_credentials_key(username, password, institution_type))
 
 class LoginRequest(BaseModel):
     college_id: str
@@ -96,82 +362,554 @@ class AttendanceResponse(BaseModel):
     success: bool
     message: str
     data: Dict[str, Dict[str, Any]] = None
-
-async def login_to_portal(username: str, password: str, institution_type: str = "college"):
+    stale: bool = False  # True when served from an expired cache entry during a portal outage
+
+# Process pool for CPU-bound HTML parsing. Parsers take raw page bytes and
+# return plain dicts/lists so results are cheap to pickle back to the event loop.
+PARSE_POOL_WORKERS = int(os.environ.get('PARSE_POOL_WORKERS', '2'))
+PARSE_INLINE_MAX_BYTES = int(os.environ.get('PARSE_INLINE_MAX_BYTES', str(32 * 1024)))
+parse_pool = None
+parse_stats = {
+    'pool_jobs': 0,
+    'inline_jobs': 0,
+    'failed_jobs': 0,
+    'queue_depth': 0,
+    'max_queue_depth': 0,
+    'total_exec_ms': 0.0,
+    'max_exec_ms': 0.0,
+    'total_wait_ms': 0.0,
+}
+
+def get_parse_pool():
+    """Create the parse pool on first use"""
+    global parse_pool
+    if parse_pool is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # The pool starts lazily, after asyncio.to_thread workers exist, and forking a
+        # threaded process can deadlock the child (e.g. on the stdout lock the parsers print with)
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        parse_pool = ProcessPoolExecutor(max_workers=PARSE_POOL_WORKERS, mp_context=multiprocessing.get_context(start_method))
+        print(f"🧵 Started parse pool with {PARSE_POOL_WORKERS} workers")
+    return parse_pool
+
+def shutdown_parse_pool() -> None:
+    """Stop the parse pool (called on app shutdown or after a worker crash)"""
+    global parse_pool
+    if parse_pool is not None:
+        parse_pool.shutdown(wait=False, cancel_futures=True)
+        parse_pool = None
+
+# Optional callback used by profiling tools (see debug_login.py); receives one dict
+# per portal request ('request') and per parse job ('parse')
+trace_observer = None
+
+def timed_parse(parser, content: bytes):
+    """Run a parser and return (result, execution time in ms)"""
+    start = time.perf_counter()
+    result = parser(content)
+    return result, (time.perf_counter() - start) * 1000
+
+def record_parse_time(exec_ms: float) -> None:
+    parse_stats['total_exec_ms'] += exec_ms
+    parse_stats['max_exec_ms'] = max(parse_stats['max_exec_ms'], exec_ms)
+
+async def run_parser(parser, content: bytes):
     """
-    Common login function for portal access
-    Returns session and attendance page soup
+    Run a parser off the event loop in the process pool.
+    Small pages are parsed in-process since pickling costs more than parsing them.
     """
-    session = requests.Session()
+    if PARSE_POOL_WORKERS <= 0 or len(content) <= PARSE_INLINE_MAX_BYTES:
+        parse_stats['inline_jobs'] += 1
+        try:
+            result, exec_ms = timed_parse(parser, content)
+        except Exception:
+            parse_stats['failed_jobs'] += 1
+            raise
+        record_parse_time(exec_ms)
+        if trace_observer is not None:
+            trace_observer({'type': 'parse', 'parser': parser.__name__, 'bytes': len(content), 'ms': exec_ms, 'where': 'inline'})
+        return result
+
+    loop = asyncio.get_running_loop()
+    parse_stats['pool_jobs'] += 1
+    parse_stats['queue_depth'] += 1
+    parse_stats['max_queue_depth'] = max(parse_stats['max_queue_depth'], parse_stats['queue_depth'])
+    start = time.perf_counter()
+    try:
+        result, exec_ms = await loop.run_in_executor(get_parse_pool(), timed_parse, parser, content)
+    except BrokenExecutor:
+        parse_stats['failed_jobs'] += 1
+        print("⚠️ Parse pool worker died - restarting pool")
+        shutdown_parse_pool()
+        raise
+    except Exception:
+        parse_stats['failed_jobs'] += 1
+        raise
+    finally:
+        parse_stats['queue_depth'] -= 1
+
+    record_parse_time(exec_ms)
+    parse_stats['total_wait_ms'] += max((time.perf_counter() - start) * 1000 - exec_ms, 0.0)
+    if trace_observer is not None:
+        trace_observer({'type': 'parse', 'parser': parser.__name__, 'bytes': len(content), 'ms': exec_ms, 'where': 'pool'})
+    return result
+
+# Cold start: heavy modules load lazily, and with PREWARM_PORTALS=1 the app warms
+# the parse pool, DNS/TLS connections and login forms right after boot.
+PREWARM_PORTALS = os.environ.get('PREWARM_PORTALS', '0') == '1'
+PREWARM_MAX_AGE_SECONDS = 600
+prewarmed_logins = {}
+prewarm_task = None
+startup_stats = {
+    'import_ms': None,
+    'prewarm_ms': None,
+    'prewarmed_portals': [],
+    'first_scrape_ms': None,
+}
+
+def record_first_scrape() -> None:
+    """Time from module import to the first scrape result being cached"""
+    if startup_stats['first_scrape_ms'] is None:
+        startup_stats['first_scrape_ms'] = round((time.perf_counter() - MODULE_IMPORT_STARTED) * 1000, 1)
+
+def close_prewarmed_logins() -> None:
+    """Close warmed sessions nobody used"""
+    for warmed in prewarmed_logins.values():
+        warmed['session'].close()
+    prewarmed_logins.clear()
+
+def warm_parser(_=None) -> int:
+    """Import and exercise the HTML parser (also run once in each pool worker)"""
+    bs4.BeautifulSoup('<table><tr><td>warm</td></tr></table>', 'html.parser').find_all('td')
+    return os.getpid()
+
+def take_prewarmed_login(login_url: str) -> Optional[dict]:
+    """Hand out a warmed session + login form once, if it is still fresh"""
+    warmed = prewarmed_logins.pop(login_url, None)
+    if warmed is None:
+        return None
+    if time.monotonic() - warmed['warmed_at'] > PREWARM_MAX_AGE_SECONDS:
+        warmed['session'].close()
+        return None
+    print(f"🔥 Using prewarmed login form for {urlparse(login_url).netloc}")
+    return warmed
 
-    # Set headers to mimic a real browser (matching working version)
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',  # No 'br' encoding
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
+async def prewarm_portal(login_url: str) -> None:
+    """Open a connection to the portal and fetch its login form ahead of the first scrape"""
+    session = requests.Session()
+    deadline = Deadline()
+    response = await deadline.fetch('prewarm login page', session.get, login_url, headers=PORTAL_HEADERS)
+    check_portal_status(response)
+    form = await deadline.parse('prewarm login form', parse_login_form, response.content)
+    prewarmed_logins[login_url] = {
+        'session': session,
+        'form': form,
+        'warmed_at': time.monotonic(),
     }
 
-    # Choose URL based on institution type
-    if institution_type == "university":
-        login_url = "https://accsoft2.lnctu.ac.in/Accsoft2/studentLogin.aspx"
-        attendance_url = "https://accsoft2.lnctu.ac.in/Accsoft2/Parents/StuAttendanceStatus.aspx"
-    else:  # default to college
-        login_url = "https://portal.lnct.ac.in/Accsoft2/StudentLogin.aspx"
-        attendance_url = "https://portal.lnct.ac.in/Accsoft2/Parents/StuAttendanceStatus.aspx"
+async def prewarm() -> None:
+    """Warm parsers, parse workers and portal connections in the background after boot"""
+    started = time.perf_counter()
+    try:
+        warm_parser()
+        if PARSE_POOL_WORKERS > 0:
+            loop = asyncio.get_running_loop()
+            pool = get_parse_pool()
+            await asyncio.gather(*(loop.run_in_executor(pool, warm_parser) for _ in range(PARSE_POOL_WORKERS)))
+
+        login_urls = [get_portal_urls(institution_type)[0] for institution_type in ('college', 'university')]
+        results = await asyncio.gather(*(prewarm_portal(url) for url in login_urls), return_exceptions=True)
+        for url, result in zip(login_urls, results):
+            host = urlparse(url).netloc
+            if isinstance(result, Exception):
+                print(f"⚠️ Could not prewarm {host}: {result}")
+            else:
+                startup_stats['prewarmed_portals'].append(host)
+    except Exception as e:
+        print(f"⚠️ Prewarm failed: {e}")
 
-    # Get login page to extract viewstate
-    response = session.get(login_url, headers=headers, timeout=10)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    startup_stats['prewarm_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"🔥 Prewarm finished in {startup_stats['prewarm_ms']}ms")
 
-    viewstate_elem = soup.find('input', {'name': '__VIEWSTATE'})
-    viewstate_gen_elem = soup.find('input', {'name': '__VIEWSTATEGENERATOR'})
-    event_validation_elem = soup.find('input', {'name': '__EVENTVALIDATION'})
+# Overall time budget for one scrape (login GET, login POST, attendance GET and parsing).
+# Kept below the Flutter client's 15s timeout so the app gets a real answer.
+LOGIN_DEADLINE_SECONDS = float(os.environ.get('LOGIN_DEADLINE_SECONDS', '12'))
+deadline_stats = {
+    'exceeded': 0,
+}
 
-    if not viewstate_elem or not event_validation_elem:
-        raise Exception("Could not extract login form data")
+class DeadlineExceeded(Exception):
+    """Raised when a scrape runs out of its overall time budget"""
 
-    viewstate = viewstate_elem['value']
-    viewstate_generator = viewstate_gen_elem['value'] if viewstate_gen_elem else ''
-    event_validation = event_validation_elem['value']
+    def __init__(self, message: str, portal_timeout: bool = False):
+        super().__init__(message)
+        # True only when a portal request itself timed out; budget used up by our own
+        # queueing or parsing says nothing about the portal's health
+        self.portal_timeout = portal_timeout
 
-    # Prepare login data (matching working version exactly)
-    login_data = {
-        '__VIEWSTATE': viewstate,
-        '__EVENTVALIDATION': event_validation,
-        '__VIEWSTATEGENERATOR': viewstate_generator,
-        'ctl00$cph1$rdbtnlType': '2',  # Student login radio button
-        'ctl00$cph1$txtStuUser': username,
-        'ctl00$cph1$txtStuPsw': password,
-        'ctl00$cph1$btnStuLogin': 'Login »',  # Correct button text
-        '__EVENTTARGET': '',
-        '__EVENTARGUMENT': '',
-        '__LASTFOCUS': '',
-    }
+class Deadline:
+    """
+    Time budget shared by every step of one scrape.
+    Each step only gets whatever is left of the budget.
+    """
 
-    # Submit login
-    login_response = session.post(login_url, data=login_data, headers=headers, allow_redirects=True, timeout=10)
+    def __init__(self, seconds: float = LOGIN_DEADLINE_SECONDS):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
 
-    # Check if login was successful by looking for redirect or success indicators
-    if "studentlogin.aspx" in login_response.url.lower():
-        raise Exception("Invalid credentials")
+    def expired(self, step: str, portal_timeout: bool = False) -> DeadlineExceeded:
+        deadline_stats['exceeded'] += 1
+        print(f"⏱️ Deadline of {self.seconds:g}s exceeded during {step}")
+        return DeadlineExceeded(
+            f"Portal did not respond within {self.seconds:g} seconds ({step}). Please try again later.",
+            portal_timeout
+        )
 
-    # Access attendance page
-    attendance_headers = headers.copy()
-    attendance_headers['Referer'] = login_url
-    attendance_response = session.get(attendance_url, headers=attendance_headers, timeout=10)
+    def remaining(self, step: str) -> float:
+        left = self.expires_at - time.monotonic()
+        if left <= 0:
+            raise self.expired(step)
+        return left
+
+    async def fetch(self, step: str, method, url: str, **kwargs):
+        """Run a blocking requests call in a thread, bounded by the remaining budget"""
+        timeout = self.remaining(step)
+        kwargs['timeout'] = timeout
+        started_at = datetime.now()
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(asyncio.to_thread(method, url, **kwargs), timeout)
+        except (asyncio.TimeoutError, requests.exceptions.Timeout):
+            raise self.expired(step, portal_timeout=True)
+
+        if trace_observer is not None:
+            trace_observer({
+                'type': 'request',
+                'step': step,
+                'started_at': started_at.isoformat(),
+                'method': method.__name__.upper(),
+                'url': url,
+                'final_url': response.url,
+                'status': response.status_code,
+                'bytes': len(response.content),
+                'ms': (time.perf_counter() - started) * 1000,
+                'response': response,
+            })
+        return response
 
-    # Check if we're redirected back to login
-    if "studentlogin.aspx" in attendance_response.url.lower():
-        raise Exception("Invalid credentials")
+    async def parse(self, step: str, parser, content: bytes):
+        """Run a parser via run_parser, bounded by the remaining budget"""
+        timeout = self.remaining(step)
+        try:
+            return await asyncio.wait_for(run_parser(parser, content), timeout)
+        except asyncio.TimeoutError:
+            raise self.expired(step)
+
+def error_response(response_model, status_code: int, message: str, headers: Optional[dict] = None, **fields) -> JSONResponse:
+    """Non-200 response with the endpoint's usual body shape"""
+    body = response_model(success=False, message=message, **fields)
+    return JSONResponse(status_code=status_code, content=body.model_dump(), headers=headers)
+
+def deadline_response(response_model, error: DeadlineExceeded, **fields) -> JSONResponse:
+    """504 response for a scrape that ran out of time"""
+    return error_response(response_model, 504, str(error), **fields)
+
+# Per-host circuit breakers so a portal outage fails fast instead of
+# every cache miss waiting out the full deadline.
+CIRCUIT_WINDOW_SIZE = int(os.environ.get('CIRCUIT_WINDOW_SIZE', '20'))
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', '5'))
+CIRCUIT_FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE', '0.5'))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', '30'))
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting a portal whose circuit is open"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"{host} is currently unavailable. Please try again in {int(retry_after) + 1} seconds.")
+        self.host = host
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker driven by the failure rate of recent portal logins.
+    Network errors, timeouts and 5xx responses count as failures; a portal that
+    answers (even with "Invalid credentials") counts as a success.
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = 'closed'
+        self.outcomes = deque(maxlen=CIRCUIT_WINDOW_SIZE)  # True = success
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + CIRCUIT_OPEN_SECONDS - time.monotonic(), 0.0)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless this call may go to the portal"""
+        if self.state == 'open':
+            if self.retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.host, self.retry_after())
+            self.state = 'half_open'
+            print(f"🔌 Circuit for {self.host} half-open - sending probe")
+
+        if self.state == 'half_open':
+            # Only a single probe request checks whether the portal recovered
+            if self.probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.host, CIRCUIT_OPEN_SECONDS)
+            self.probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state == 'half_open':
+            print(f"🔌 Circuit for {self.host} closed - portal recovered")
+            self.outcomes.clear()
+        self.state = 'closed'
+        self.probe_in_flight = False
+        self.outcomes.append(True)
+
+    def record_failure(self) -> None:
+        self.outcomes.append(False)
+        if self.state == 'half_open' or (
+            len(self.outcomes) >= CIRCUIT_MIN_CALLS and self.failure_rate() >= CIRCUIT_FAILURE_RATE
+        ):
+            self.trip()
+        self.probe_in_flight = False
+
+    def trip(self) -> None:
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"🔌 Circuit for {self.host} opened (failure rate {self.failure_rate():.0%})")
+
+    def release_probe(self) -> None:
+        """Let another request probe if this one ended without an outcome (e.g. cancelled)"""
+        self.probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 3),
+            "recent_calls": len(self.outcomes),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after_seconds": round(self.retry_after(), 1) if self.state == 'open' else 0,
+        }
+
+circuit_breakers = {}
+
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    host = urlparse(url).netloc
+    if host not in circuit_breakers:
+        circuit_breakers[host] = CircuitBreaker(host)
+    return circuit_breakers[host]
+
+def check_portal_status(response) -> None:
+    """Treat portal 5xx pages as failures rather than parsing them"""
+    if response.status_code >= 500:
+        raise requests.exceptions.HTTPError(f"Portal returned HTTP {response.status_code}", response=response)
+
+def stale_reason(error) -> str:
+    if isinstance(error, ScrapeRejected):
+        return f"scrape {error.reason}"
+    return f"{error.host} circuit open"
+
+def unavailable_message(error) -> str:
+    if isinstance(error, ScrapeRejected):
+        return "Server is busy"
+    return "Portal is currently unavailable"
+
+def stale_or_unavailable(response_model, username: str, endpoint: str, error, respond=None, **fields):
+    """
+    While a circuit is open (CircuitOpenError) or the scrape queue is full (ScrapeRejected)
+    serve the last scrape (however old), flagged as stale
+    `respond(data, message)` builds the success response when it needs more than `data`
+    (e.g. delta sync)
+    """
+    entry = get_stale_cached_data(username, endpoint)
+    if entry is not None:
+        print(f"🧊 Serving stale data for {username} - {endpoint} ({stale_reason(error)})")
+        message = f"{unavailable_message(error)} - showing data last updated {entry['timestamp']}"
+        if respond is not None:
+            response = respond(entry['data'], message)
+            response.stale = True
+            return response
+        return response_model(
+            success=True,
+            message=message,
+            data=entry['data'],
+            stale=True
+        )
+
+    return error_response(
+        response_model, 503, str(error),
+        headers={"Retry-After": str(int(error.retry_after) + 1)},
+        **fields
+    )
+
+# Admission control for cache-miss scrapes. Cache hits never wait here; only
+# requests that have to go to the portal take a slot. When every slot is busy
+# they wait in a bounded queue where interactive requests go ahead of
+# background refreshes, and anything that can't be queued is turned away
+# immediately with Retry-After instead of timing out with everyone else.
+SCRAPE_CONCURRENCY = int(os.environ.get('SCRAPE_CONCURRENCY', '4'))
+SCRAPE_QUEUE_SIZE = int(os.environ.get('SCRAPE_QUEUE_SIZE', '16'))
+SCRAPE_BACKGROUND_QUEUE_LIMIT = int(os.environ.get('SCRAPE_BACKGROUND_QUEUE_LIMIT', '4'))
+SCRAPE_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('SCRAPE_QUEUE_TIMEOUT_SECONDS', '4'))
+SCRAPE_PRIORITIES = {'interactive': 0, 'background': 1}
+
+class ScrapeRejected(Exception):
+    """Raised when a cache-miss scrape can't be admitted right now"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server is busy. Please try again in {int(retry_after) + 1} seconds.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Limits concurrent scrapes and queues the rest by priority.
+    A released slot is handed straight to the best waiter, so a newcomer can
+    never jump the queue.
+    """
+
+    def __init__(self, concurrency: int, queue_size: int, background_limit: int, queue_timeout: float):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.background_limit = background_limit
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiters = []  # heap of (priority, sequence, future)
+        self.queued = {priority: 0 for priority in SCRAPE_PRIORITIES}
+        self.sequence = 0
+        self.average_scrape_seconds = 3.0  # moving average, used for Retry-After
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'background_shed': 0, 'queue_timeout': 0}
+        self.max_queued = 0
+
+    def queue_length(self) -> int:
+        return sum(self.queued.values())
+
+    def retry_after(self) -> float:
+        """Rough time until a new request would get a slot"""
+        waves = (self.queue_length() + self.concurrency) / max(self.concurrency, 1)
+        return max(self.average_scrape_seconds * waves, 1.0)
+
+    def reject(self, reason: str) -> ScrapeRejected:
+        self.rejected[reason] += 1
+        print(f"🚦 Scrape rejected ({reason}): {self.active} active, {self.queue_length()} queued")
+        return ScrapeRejected(reason, self.retry_after())
+
+    async def acquire(self, priority: str) -> None:
+        """Take a scrape slot, waiting in the queue if needed; raises ScrapeRejected"""
+        rank = SCRAPE_PRIORITIES.get(priority, 0)
+        priority = 'background' if rank else 'interactive'
+
+        if self.active < self.concurrency and not self.queue_length():
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if self.queue_length() >= self.queue_size:
+            raise self.reject('queue_full')
+        if rank and self.queue_length() >= self.background_limit:
+            raise self.reject('background_shed')
+
+        future = asyncio.get_running_loop().create_future()
+        self.sequence += 1
+        heapq.heappush(self.waiters, (rank, self.sequence, future))
+        self.queued[priority] += 1
+        self.max_queued = max(self.max_queued, self.queue_length())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                # Granted just as the wait ran out - take the slot after all
+                self.admitted += 1
+                return
+            future.cancel()
+            raise self.reject('queue_timeout')
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot we were already handed
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self.queued[priority] -= 1
+        self.admitted += 1
+
+    def release(self, scrape_seconds: Optional[float] = None) -> None:
+        """Free a slot, handing it to the highest-priority waiter still queued"""
+        if scrape_seconds is not None:
+            self.average_scrape_seconds = 0.8 * self.average_scrape_seconds + 0.2 * scrape_seconds
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str = 'interactive'):
+        await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queue_length": self.queue_length(),
+            "queued": dict(self.queued),
+            "max_queue_length": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "rejected_total": sum(self.rejected.values()),
+            "average_scrape_seconds": round(self.average_scrape_seconds, 2),
+        }
+
+scrape_admission = AdmissionController(
+    SCRAPE_CONCURRENCY, SCRAPE_QUEUE_SIZE, SCRAPE_BACKGROUND_QUEUE_LIMIT, SCRAPE_QUEUE_TIMEOUT_SECONDS
+)
 
-    # Parse the attendance page
-    soup = BeautifulSoup(attendance_response.content, 'html.parser')
+def parse_login_form(content: bytes) -> dict:
+    """Extract the ASP.NET hidden fields from the login page"""
+    soup = bs4.BeautifulSoup(content, 'html.parser')
 
-    # Basic validation: Check if the page actually contains attendance data
-    # This prevents cross-institution login issues
+    viewstate_elem = soup.find('input', {'name': '__VIEWSTATE'})
+    viewstate_gen_elem = soup.find('input', {'name': '__VIEWSTATEGENERATOR'})
+    event_validation_elem = soup.find('input', {'name': '__EVENTVALIDATION'})
+
+    if not viewstate_elem or not event_validation_elem:
+        raise Exception("Could not extract login form data")
+
+    return {
+        'viewstate': viewstate_elem['value'],
+        'viewstate_generator': viewstate_gen_elem['value'] if viewstate_gen_elem else '',
+        'event_validation': event_validation_elem['value'],
+    }
+
+def validate_attendance_page(soup) -> None:
+    """
+    Basic validation: Check if the page actually contains attendance data
+    This prevents cross-institution login issues
+    """
     page_text = soup.get_text().lower()
 
     # Look for common attendance-related content
@@ -185,7 +923,7 @@ async def login_to_portal(username: str, password: str, institution_type: str =
 
     # If page has no attendance content or tables, it's likely wrong credentials for this portal
     if not has_attendance_content and not has_data_tables:
-        raise Exception("Invalid credentials for this institution")
+        raise InvalidCredentialsError("Invalid credentials for this institution")
 
     # Additional check: Look for actual student data in tables
     has_student_data = False
@@ -203,182 +941,219 @@ async def login_to_portal(username: str, password: str, institution_type: str =
                         break
 
     if not has_student_data:
-        raise Exception("No attendance data found - invalid credentials for this institution")
-
-    return session, soup
+        raise InvalidCredentialsError("No attendance data found - invalid credentials for this institution")
 
-@app.post("/login-and-fetch-attendance", response_model=AttendanceResponse)
-async def login_and_fetch_attendance(request: LoginRequest):
+async def login_to_portal(username: str, password: str, institution_type: str = "college", deadline: Optional[Deadline] = None):
     """
-    Login to the college portal and fetch attendance data
-    Uses 6-hour caching to optimize Heroku dyno usage
+    Common login function for portal access
+    Returns session and raw attendance page bytes (parse with run_parser)
+    Every step shares the caller's deadline; the session is closed if it runs out
     """
+    if deadline is None:
+        deadline = Deadline()
+
+    login_url, attendance_url = get_portal_urls(institution_type)
+    breaker = get_circuit_breaker(login_url)
+    breaker.before_call()
+
+    # The first scrape after boot can reuse a connection and login form warmed by prewarm()
+    warmed = take_prewarmed_login(login_url)
+    session = warmed['session'] if warmed else requests.Session()
     try:
-        # Check if we have cached data that's less than 6 hours old
-        cached_data = get_cached_data(request.college_id, 'attendance')
-        if cached_data:
-            return AttendanceResponse(
-                success=True,
-                message="Attendance data retrieved from cache (less than 6 hours old)",
-                data=cached_data
-            )
+        result = await _login_steps(session, username, password, login_url, attendance_url, deadline,
+                                    form=warmed['form'] if warmed else None)
+    except DeadlineExceeded as e:
+        if e.portal_timeout:
+            breaker.record_failure()
+        # Drop pooled connections so the dead request stops holding portal capacity
+        session.close()
+        raise
+    except requests.exceptions.RequestException:
+        breaker.record_failure()
+        raise
+    except Exception:
+        # The portal answered (e.g. invalid credentials), so it is up
+        breaker.record_success()
+        raise
+    finally:
+        breaker.release_probe()
+
+    breaker.record_success()
+    return result
+
+def get_portal_urls(institution_type: str):
+    """Return (login_url, attendance_url) for the institution's portal"""
+    if institution_type == "university":
+        return ("https://accsoft2.lnctu.ac.in/Accsoft2/studentLogin.aspx",
+                "https://accsoft2.lnctu.ac.in/Accsoft2/Parents/StuAttendanceStatus.aspx")
+    # default to college
+    return ("https://portal.lnct.ac.in/Accsoft2/StudentLogin.aspx",
+            "https://portal.lnct.ac.in/Accsoft2/Parents/StuAttendanceStatus.aspx")
+
+# Set headers to mimic a real browser (matching working version)
+PORTAL_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',  # No 'br' encoding
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+async def _login_steps(session, username: str, password: str, login_url: str, attendance_url: str, deadline: Deadline,
+                       form: Optional[dict] = None):
+    """Login GET, login POST and attendance GET against the portal"""
+    headers = PORTAL_HEADERS
+
+    # Get login page to extract viewstate (skipped when a prewarmed form is supplied)
+    if form is None:
+        response = await deadline.fetch('login page', session.get, login_url, headers=headers)
+        check_portal_status(response)
+        form = await deadline.parse('login form', parse_login_form, response.content)
 
-        print(f"🔄 Fetching fresh data for {request.college_id} - cache miss or expired")
+    # Prepare login data (matching working version exactly)
+    login_data = {
+        '__VIEWSTATE': form['viewstate'],
+        '__EVENTVALIDATION': form['event_validation'],
+        '__VIEWSTATEGENERATOR': form['viewstate_generator'],
+        'ctl00$cph1$rdbtnlType': '2',  # Student login radio button
+        'ctl00$cph1$txtStuUser': username,
+        'ctl00$cph1$txtStuPsw': password,
+        'ctl00$cph1$btnStuLogin': 'Login »',  # Correct button text
+        '__EVENTTARGET': '',
+        '__EVENTARGUMENT': '',
+        '__LASTFOCUS': '',
+    }
 
-        # Use common login function
-        session, soup = await login_to_portal(request.college_id, request.password, request.institution_type)
+    # Submit login
+    login_response = await deadline.fetch('login submit', session.post, login_url, data=login_data, headers=headers, allow_redirects=True)
+    check_portal_status(login_response)
 
-        # Initialize attendance data
-        attendance_data = {}
+    # Check if login was successful by looking for redirect or success indicators
+    if "studentlogin.aspx" in login_response.url.lower():
+        raise InvalidCredentialsError("Invalid credentials")
 
-        # Look for attendance table in the soup
-        tables = soup.find_all('table')
-        print(f"Found {len(tables)} tables on attendance page")
+    # Access attendance page
+    attendance_headers = headers.copy()
+    attendance_headers['Referer'] = login_url
+    attendance_response = await deadline.fetch('attendance page', session.get, attendance_url, headers=attendance_headers)
+    check_portal_status(attendance_response)
 
-        for i, table in enumerate(tables):
-            print(f"\n=== Table {i+1} ===")
-            rows = table.find_all('tr')
-            print(f"Table {i+1} has {len(rows)} rows")
+    # Check if we're redirected back to login
+    if "studentlogin.aspx" in attendance_response.url.lower():
+        raise InvalidCredentialsError("Invalid credentials")
 
-            for j, row in enumerate(rows):
-                cells = row.find_all(['td', 'th'])
-                if len(cells) >= 4:  # Subject, Total, Attended, Percentage
-                    cell_texts = [cell.get_text(strip=True) for cell in cells]
-                    print(f"Row {j+1}: {cell_texts}")
-
-                    # Try to parse attendance data
-                    if j > 0 and len(cell_texts) >= 4:  # Skip header row
-                        try:
-                            subject = cell_texts[0]
-                            if subject and not subject.lower() in ['subject', 'total', '']:
-                                # Try different cell positions for total/attended/percentage
-                                for k in range(1, len(cell_texts)-2):
-                                    try:
-                                        total = int(cell_texts[k])
-                                        attended = int(cell_texts[k+1])
-                                        percentage_text = cell_texts[k+2].replace('%', '').replace(' ', '')
-                                        percentage = float(percentage_text)
-
-                                        if total > 0 and attended >= 0 and 0 <= percentage <= 100:
-                                            attendance_data[subject] = {
-                                                "total": total,
-                                                "attended": attended,
-                                                "percentage": round(percentage, 2) if percentage is not None else None
-                                            }
-                                            print(f"✓ Added subject: {subject} -> {attendance_data[subject]}")
-                                            break
-                                    except (ValueError, IndexError):
-                                        continue
-                        except Exception as e:
-                            print(f"Error parsing row: {e}")
-                            continue
+    return session, attendance_response.content
 
-        if attendance_data:
-            print(f"✅ Successfully found attendance data: {attendance_data}")
+def parse_subject_attendance(content: bytes) -> dict:
+    """Extract the per-subject summary table from the attendance page"""
+    soup = bs4.BeautifulSoup(content, 'html.parser')
+    validate_attendance_page(soup)
 
-            # Cache the successful response for 6 hours
-            set_cached_data(request.college_id, 'attendance', attendance_data)
+    # Initialize attendance data
+    attendance_data = {}
 
-            return AttendanceResponse(
-                success=True,
-                message="Attendance data fetched successfully",
-                data=attendance_data
-            )
-        else:
-            print("No attendance data found in tables")
-            return AttendanceResponse(
-                success=False,
-                message="No attendance data found on the page. The page structure may have changed."
-            )
-        # Step 4: Access the specific attendance page
-        attendance_url = "https://portal.lnct.ac.in/Accsoft2/Parents/StuAttendanceStatus.aspx"
-        attendance_headers = headers.copy()
-        attendance_headers['Referer'] = login_url
-        try:
-            attendance_response = session.get(attendance_url, headers=attendance_headers, timeout=5)
-        except requests.exceptions.Timeout:
-            print("Attendance request timed out.")
-            return AttendanceResponse(
-                success=False,
-                message="Attendance request timed out. Please try again later.",
-            )
-        except Exception as e:
-            print(f"Attendance request failed: {e}.")
-            return AttendanceResponse(
-                success=False,
-                message=f"Attendance request error: {str(e)}",
-            )
+    tables = soup.find_all('table')
+    print(f"Found {len(tables)} tables on attendance page")
+
+    for i, table in enumerate(tables):
+        print(f"\n=== Table {i+1} ===")
+        rows = table.find_all('tr')
+        print(f"Table {i+1} has {len(rows)} rows")
+
+        for j, row in enumerate(rows):
+            cells = row.find_all(['td', 'th'])
+            if len(cells) >= 4:  # Subject, Total, Attended, Percentage
+                cell_texts = [cell.get_text(strip=True) for cell in cells]
+                print(f"Row {j+1}: {cell_texts}")
+
+                # Try to parse attendance data
+                if j > 0 and len(cell_texts) >= 4:  # Skip header row
+                    try:
+                        subject = cell_texts[0]
+                        if subject and not subject.lower() in ['subject', 'total', '']:
+                            # Try different cell positions for total/attended/percentage
+                            for k in range(1, len(cell_texts)-2):
+                                try:
+                                    total = int(cell_texts[k])
+                                    attended = int(cell_texts[k+1])
+                                    percentage_text = cell_texts[k+2].replace('%', '').replace(' ', '')
+                                    percentage = float(percentage_text)
+
+                                    if total > 0 and attended >= 0 and 0 <= percentage <= 100:
+                                        attendance_data[subject] = {
+                                            "total": total,
+                                            "attended": attended,
+                                            "percentage": round(percentage, 2) if percentage is not None else None
+                                        }
+                                        print(f"✓ Added subject: {subject} -> {attendance_data[subject]}")
+                                        break
+                                except (ValueError, IndexError):
+                                    continue
+                    except Exception as e:
+                        print(f"Error parsing row: {e}")
+                        continue
+
+    return attendance_data
+
+async def scrape_portal(username: str, password: str, institution_type: str, kind: str, parser, priority: str):
+    """
+    Log in to the portal and run `parser` on the attendance page off the event loop
+    Repeated wrong credentials are answered from the failed-login cache without contacting
+    the portal, and time spent queued for a scrape slot counts against the deadline
+    """
+    cached_failure = get_failed_login(username, password, institution_type)
+    if cached_failure:
+        raise cached_failure
+
+    print(f"🔄 Fetching fresh {kind} data for {username} - cache miss or expired")
+
+    deadline = Deadline()
+    async with scrape_admission.slot(priority):
+        session, content = await login_to_portal(username, password, institution_type, deadline)
+        result = await deadline.parse('attendance parsing', parser, content)
+    record_successful_login(username, password, institution_type)
+    return result
+
+async def scrape_subject_attendance(username: str, password: str, institution_type: str,
+                                    priority: str = 'interactive') -> dict:
+    """
+    Log in, parse the subject summary and refresh its cache
+    Returns an empty dict if no attendance table was found
+    """
+    attendance_data = await scrape_portal(
+        username, password, institution_type, 'subject', parse_subject_attendance, priority
+    )
 
-        # DEBUG: Check if we're not redirected back to login
-        if "studentlogin.aspx" in attendance_response.url.lower():
-            print("Redirected to login - session may have expired")
+    if attendance_data:
+        print(f"✅ Successfully found attendance data: {attendance_data}")
+
+        # Cache the successful response for 6 hours
+        set_cached_data(username, 'attendance', attendance_data)
+
+    return attendance_data
+
+@router.post("/login-and-fetch-attendance", response_model=AttendanceResponse)
+async def login_and_fetch_attendance(request: LoginRequest, x_request_priority: Optional[str] = Header(None)):
+    """
+    Login to the college portal and fetch attendance data
+    Uses 6-hour caching to optimize Heroku dyno usage
+    """
+    try:
+        # Check if we have cached data that's less than 6 hours old
+        cached_data = get_cached_data(request.college_id, 'attendance')
+        if cached_data:
             return AttendanceResponse(
-                success=False,
-                message="Session expired or login failed. Please try again.",
+                success=True,
+                message="Attendance data retrieved from cache (less than 6 hours old)",
+                data=cached_data
             )
 
-        attendance_soup = BeautifulSoup(attendance_response.content, 'html.parser')
-        print(f"Attendance page length: {len(attendance_response.text)}")
-
-        # Initialize attendance data
-        attendance_data = {}
-
-        # Look for attendance tables
-        tables = attendance_soup.find_all('table')
-        print(f"Found {len(tables)} tables to analyze")
-
-        for table_idx, table in enumerate(tables):
-            rows = table.find_all('tr')
-            if len(rows) > 1:
-                print(f"\n=== Analyzing Table {table_idx + 1} ===")
-                # Log the first 5 rows for debugging
-                for debug_row_idx, debug_row in enumerate(rows[:5]):
-                    debug_cells = [cell.get_text(strip=True) for cell in debug_row.find_all(['th', 'td'])]
-                    print(f"Debug Row {debug_row_idx}: {debug_cells}")
-                # Look for header row
-                header_row = rows[0]
-                header_cells = [cell.get_text(strip=True).lower() for cell in header_row.find_all(['th', 'td'])]
-                print(f"Header row: {header_cells}")
-                attendance_keywords = ['subject', 'attendance', 'present', 'absent', 'total', 'percentage', '%']
-                has_attendance_headers = any(keyword in ' '.join(header_cells) for keyword in attendance_keywords)
-                if has_attendance_headers or len(rows) > 3:
-                    print("Found potential attendance table!")
-                    # Find the index of the subject, total, attended, and percentage columns
-                    subject_idx = None
-                    total_idx = None
-                    attended_idx = None
-                    percentage_idx = None
-                    for idx, col in enumerate(header_cells):
-                        if 'subject' in col or 'course' in col:
-                            subject_idx = idx
-                        if 'total' in col:
-                            total_idx = idx
-                        if 'attend' in col or 'present' in col:
-                            attended_idx = idx
-                        if 'percent' in col or '%' in col:
-                            percentage_idx = idx
-                    for row_idx, row in enumerate(rows[1:], 1):
-                        cells = row.find_all(['td', 'th'])
-                        cell_texts = [cell.get_text(strip=True) for cell in cells]
-                        if any(cell_texts) and subject_idx is not None:
-                            subject = cell_texts[subject_idx] if subject_idx < len(cell_texts) else None
-                            total = int(cell_texts[total_idx]) if total_idx is not None and total_idx < len(cell_texts) and cell_texts[total_idx].isdigit() else None
-                            attended = int(cell_texts[attended_idx]) if attended_idx is not None and attended_idx < len(cell_texts) and cell_texts[attended_idx].isdigit() else None
-                            percentage = float(cell_texts[percentage_idx]) if percentage_idx is not None and percentage_idx < len(cell_texts) and re.match(r'\d+\.?\d*', cell_texts[percentage_idx]) else None
-                            if subject and total is not None and attended is not None:
-                                attendance_data[subject] = {
-                                    "total": total,
-                                    "attended": attended,
-                                    "percentage": round(percentage, 2) if percentage is not None else None
-                                }
-                                print(f"✓ Added subject: {subject} -> {attendance_data[subject]}")
+        attendance_data = await scrape_subject_attendance(
+            request.college_id, request.password, request.institution_type, x_request_priority or 'interactive'
+        )
 
         if attendance_data:
-            print(f"\n✅ Successfully found attendance data: {attendance_data}")
-
-            # Cache the successful response for 6 hours
-            set_cached_data(request.college_id, 'attendance', attendance_data)
-
             return AttendanceResponse(
                 success=True,
                 message="Attendance data fetched successfully",
@@ -386,14 +1161,21 @@ async def login_and_fetch_attendance(request: LoginRequest):
             )
         else:
             print("No attendance data found in tables")
-            # Debug: Show page content snippet
-            page_snippet = attendance_response.text[:1000].replace('\n', ' ').replace('\r', '')
-            print(f"Page content preview: {page_snippet}...")
             return AttendanceResponse(
                 success=False,
                 message="No attendance data found on the page. The page structure may have changed."
             )
 
+    except DeadlineExceeded as e:
+        return deadline_response(AttendanceResponse, e)
+    except (CircuitOpenError, ScrapeRejected) as e:
+        return stale_or_unavailable(AttendanceResponse, request.college_id, 'attendance', e)
+    except InvalidCredentialsError as e:
+        record_failed_login(request.college_id, request.password, request.institution_type, e)
+        return AttendanceResponse(
+            success=False,
+            message=f"General error: {str(e)}",
+        )
     except requests.exceptions.RequestException as e:
         print(f"Network error: {e}")
         return AttendanceResponse(
@@ -407,180 +1189,383 @@ async def login_and_fetch_attendance(request: LoginRequest):
             message=f"General error: {str(e)}",
         )
 
-class DatewiseAttendanceResponse(BaseModel):
+# What-if projections for every subject across many targets and horizons in one call.
+# Thresholds are percentages; horizons are numbers of upcoming classes.
+PROJECTION_MAX_THRESHOLDS = 50
+PROJECTION_MAX_HORIZONS = 100
+
+def project_attendance(attendance_data: dict, thresholds: List[float], horizons: List[int]) -> dict:
+    """
+    Batched bunk/target maths over subjects x thresholds x horizons
+    Uses the same formulas as the app's calculator; the last row is the overall total
+    """
+    import numpy as np
+
+    if not thresholds or len(thresholds) > PROJECTION_MAX_THRESHOLDS:
+        raise ValueError(f"Provide between 1 and {PROJECTION_MAX_THRESHOLDS} thresholds")
+    if len(horizons) > PROJECTION_MAX_HORIZONS:
+        raise ValueError(f"Provide at most {PROJECTION_MAX_HORIZONS} horizons")
+    if any(not 0 < threshold < 100 for threshold in thresholds):
+        raise ValueError("Thresholds must be percentages between 0 and 100")
+    if any(horizon < 0 for horizon in horizons):
+        raise ValueError("Horizons must not be negative")
+
+    subjects = list(attendance_data) + ['Overall']
+    attended = np.array([entry['attended'] for entry in attendance_data.values()], dtype=np.float64)
+    total = np.array([entry['total'] for entry in attendance_data.values()], dtype=np.float64)
+    attended = np.append(attended, attended.sum())
+    total = np.append(total, total.sum())
+
+    # Broadcast to (subjects, thresholds, horizons)
+    a = attended[:, None, None]
+    t = total[:, None, None]
+    p = np.asarray(thresholds, dtype=np.float64)[None, :, None]
+    h = np.asarray(horizons, dtype=np.float64)[None, None, :]
+    eps = 1e-9  # keep exact boundaries (e.g. 30/40 at 75%) from rounding the wrong way
+
+    # Classes to attend in a row to reach the target, and classes that can be missed now
+    classes_needed = np.maximum(np.ceil((p * t - a * 100) / (100 - p) - eps), 0)[:, :, 0]
+    safe_to_skip = np.maximum(np.floor((a * 100 - p * t) / p + eps), 0)[:, :, 0]
+
+    # Most of the next h classes that can be missed while staying at the target;
+    # -1 means the target can't be reached within h classes even attending all of them
+    max_skips = np.floor(a + h - p * (t + h) / 100 + eps)
+    max_skips = np.where(max_skips < 0, -1, np.minimum(max_skips, h))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if_attend_all = np.where(t + h > 0, (a + h) * 100 / (t + h), 100.0)[:, 0, :]
+        if_skip_all = np.where(t + h > 0, a * 100 / (t + h), 100.0)[:, 0, :]
+
+    return {
+        'subjects': subjects,
+        'thresholds': list(thresholds),
+        'horizons': list(horizons),
+        'attended': attended.astype(int).tolist(),
+        'total': total.astype(int).tolist(),
+        'classes_needed': classes_needed.astype(int).tolist(),        # [subject][threshold]
+        'safe_to_skip': safe_to_skip.astype(int).tolist(),            # [subject][threshold]
+        'max_skips_in_horizon': max_skips.astype(int).tolist(),       # [subject][threshold][horizon]
+        'percentage_if_attend_all': np.round(if_attend_all, 2).tolist(),  # [subject][horizon]
+        'percentage_if_skip_all': np.round(if_skip_all, 2).tolist(),      # [subject][horizon]
+    }
+
+class ProjectionRequest(BaseModel):
+    college_id: str
+    password: str
+    institution_type: str = "college"
+    thresholds: List[float] = [75.0]
+    horizons: List[int] = [5, 10, 20, 40]
+
+class ProjectionResponse(BaseModel):
     success: bool
     message: str
-    data: list = None
+    data: Dict[str, Any] = None
+    stale: bool = False
 
-@app.get("/dateWise")
-async def get_datewise_attendance(username: str, password: str, institution_type: str = "college"):
+@router.post("/projection")
+async def attendance_projection(request: ProjectionRequest, x_request_priority: Optional[str] = Header(None)):
     """
-    Get date-wise attendance
-    Uses 6-hour caching to optimize Heroku dyno usage
+    Classes safe to skip and classes needed for every subject, threshold and horizon
+    Computed from the cached subject summary in one batched calculation
     """
     try:
-        # Check if we have cached data that's less than 6 hours old
-        cached_data = get_cached_data(username, 'datewise')
-        if cached_data:
-            return DatewiseAttendanceResponse(
-                success=True,
-                message="Date-wise attendance retrieved from cache (less than 6 hours old)",
-                data=cached_data
+        attendance_data = get_cached_data(request.college_id, 'attendance')
+        stale = False
+        if not attendance_data:
+            try:
+                attendance_data = await scrape_subject_attendance(
+                    request.college_id, request.password, request.institution_type, x_request_priority or 'interactive'
+                )
+            except (CircuitOpenError, ScrapeRejected) as e:
+                entry = get_stale_cached_data(request.college_id, 'attendance')
+                if entry is None:
+                    return stale_or_unavailable(ProjectionResponse, request.college_id, 'attendance', e)
+                attendance_data, stale = entry['data'], True
+
+        if not attendance_data:
+            return ProjectionResponse(
+                success=False,
+                message="No attendance data found on the page. The page structure may have changed."
             )
 
-        print(f"🔄 Fetching fresh date-wise data for {username} - cache miss or expired")
-
-        # Use common login function
-        session, soup = await login_to_portal(username, password, institution_type)
-
-        # Find all span elements to debug what's available
-        total_period_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotperiod'})
-        not_applicable_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotaln'})
-
-        print(f"Total period element found: {total_period_element is not None}")
-        print(f"Not applicable element found: {not_applicable_element is not None}")
-
-        # If we can't find the specific elements, let's look for any elements with 'lbltot' in the id
-        if not total_period_element:
-            lbltot_elements = soup.find_all('span', {'id': lambda x: x and 'lbltot' in x})
-            print(f"Found {len(lbltot_elements)} elements with 'lbltot' in id:")
-            for elem in lbltot_elements:
-                print(f"  ID: {elem.get('id')}, Text: {elem.get_text(strip=True)}")
-
-            # Try alternative ID patterns
-            total_period_element = soup.find('span', {'id': lambda x: x and 'lbltotperiod' in x}) or \
-                                 soup.find('span', {'id': lambda x: x and 'totperiod' in x})
-
-        if not not_applicable_element:
-            lbltotal_elements = soup.find_all('span', {'id': lambda x: x and 'lbltotal' in x})
-            print(f"Found {len(lbltotal_elements)} elements with 'lbltotal' in id:")
-            for elem in lbltotal_elements:
-                print(f"  ID: {elem.get('id')}, Text: {elem.get_text(strip=True)}")
-
-            not_applicable_element = soup.find('span', {'id': lambda x: x and 'lbltotaln' in x}) or \
-                                   soup.find('span', {'id': lambda x: x and 'totaln' in x})
-
-        # If still not found, return all spans for debugging
-        if not total_period_element or not not_applicable_element:
-            all_spans = soup.find_all('span')
-            print(f"Total spans found: {len(all_spans)}")
-            span_info = []
-            for span in all_spans[:20]:  # First 20 spans for debugging
-                span_info.append({
-                    'id': span.get('id', 'no-id'),
-                    'text': span.get_text(strip=True)[:50]  # First 50 chars
-                })
+        return ProjectionResponse(
+            success=True,
+            message="Projection calculated successfully",
+            data=project_attendance(attendance_data, request.thresholds, request.horizons),
+            stale=stale
+        )
 
-            raise Exception(f"Could not find attendance data elements. Found spans: {span_info}")
+    except ValueError as e:
+        return ProjectionResponse(success=False, message=str(e))
+    except DeadlineExceeded as e:
+        return deadline_response(ProjectionResponse, e)
+    except InvalidCredentialsError as e:
+        record_failed_login(request.college_id, request.password, request.institution_type, e)
+        return ProjectionResponse(success=False, message=f"General error: {str(e)}")
+    except Exception as e:
+        print(f"Error in projection endpoint: {e}")
+        return ProjectionResponse(success=False, message=f"General error: {str(e)}")
+
+def parse_datewise_attendance(content: bytes) -> list:
+    """Group the per-lecture rows of the attendance page by date"""
+    soup = bs4.BeautifulSoup(content, 'html.parser')
+    validate_attendance_page(soup)
+
+    # Find all span elements to debug what's available
+    total_period_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotperiod'})
+    not_applicable_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotaln'})
+
+    print(f"Total period element found: {total_period_element is not None}")
+    print(f"Not applicable element found: {not_applicable_element is not None}")
+
+    # If we can't find the specific elements, let's look for any elements with 'lbltot' in the id
+    if not total_period_element:
+        lbltot_elements = soup.find_all('span', {'id': lambda x: x and 'lbltot' in x})
+        print(f"Found {len(lbltot_elements)} elements with 'lbltot' in id:")
+        for elem in lbltot_elements:
+            print(f"  ID: {elem.get('id')}, Text: {elem.get_text(strip=True)}")
+
+        # Try alternative ID patterns
+        total_period_element = soup.find('span', {'id': lambda x: x and 'lbltotperiod' in x}) or \
+                             soup.find('span', {'id': lambda x: x and 'totperiod' in x})
+
+    if not not_applicable_element:
+        lbltotal_elements = soup.find_all('span', {'id': lambda x: x and 'lbltotal' in x})
+        print(f"Found {len(lbltotal_elements)} elements with 'lbltotal' in id:")
+        for elem in lbltotal_elements:
+            print(f"  ID: {elem.get('id')}, Text: {elem.get_text(strip=True)}")
+
+        not_applicable_element = soup.find('span', {'id': lambda x: x and 'lbltotaln' in x}) or \
+                               soup.find('span', {'id': lambda x: x and 'totaln' in x})
+
+    # If still not found, return all spans for debugging
+    if not total_period_element or not not_applicable_element:
+        all_spans = soup.find_all('span')
+        print(f"Total spans found: {len(all_spans)}")
+        span_info = []
+        for span in all_spans[:20]:  # First 20 spans for debugging
+            span_info.append({
+                'id': span.get('id', 'no-id'),
+                'text': span.get_text(strip=True)[:50]  # First 50 chars
+            })
 
-        total_period_text = total_period_element.get_text(strip=True)
-        not_applicable_text = not_applicable_element.get_text(strip=True)
+        raise Exception(f"Could not find attendance data elements. Found spans: {span_info}")
 
-        print(f"Total period text: {total_period_text}")
-        print(f"Not applicable text: {not_applicable_text}")
+    total_period_text = total_period_element.get_text(strip=True)
+    not_applicable_text = not_applicable_element.get_text(strip=True)
 
-        # Extract numbers from text like "Total Period : 50"
-        total = 0
-        not_applicable = 0
+    print(f"Total period text: {total_period_text}")
+    print(f"Not applicable text: {not_applicable_text}")
 
-        if ':' in total_period_text:
-            try:
-                total = int(total_period_text.split(':')[1].strip())
-            except (ValueError, IndexError):
-                print(f"Could not parse total from: {total_period_text}")
+    # Extract numbers from text like "Total Period : 50"
+    total = 0
+    not_applicable = 0
 
-        if ':' in not_applicable_text:
-            try:
-                not_applicable = int(not_applicable_text.split(':')[1].strip())
-            except (ValueError, IndexError):
-                print(f"Could not parse not_applicable from: {not_applicable_text}")
-
-        total_rows = total + not_applicable
-        print(f"Total rows to process: {total_rows}")
-
-        # Find attendance table
-        tables = soup.find_all('table')
-        print(f"Found {len(tables)} tables")
-
-        attendance_table = None
-        for i, table in enumerate(tables):
-            rows = table.find_all('tr')
-            print(f"Table {i}: {len(rows)} rows")
-            if len(rows) > 20:  # Look for table with significant rows
-                attendance_table = table
-                print(f"Selected table {i} as attendance table")
-                break
+    if ':' in total_period_text:
+        try:
+            total = int(total_period_text.split(':')[1].strip())
+        except (ValueError, IndexError):
+            print(f"Could not parse total from: {total_period_text}")
 
-        if not attendance_table:
-            # Use the largest table if none found with > 20 rows
-            if tables:
-                attendance_table = max(tables, key=lambda t: len(t.find_all('tr')))
-                print(f"Using largest table with {len(attendance_table.find_all('tr'))} rows")
+    if ':' in not_applicable_text:
+        try:
+            not_applicable = int(not_applicable_text.split(':')[1].strip())
+        except (ValueError, IndexError):
+            print(f"Could not parse not_applicable from: {not_applicable_text}")
 
-        if not attendance_table:
-            raise Exception("Could not find any attendance table")
+    total_rows = total + not_applicable
+    print(f"Total rows to process: {total_rows}")
 
-        rows = attendance_table.find_all('tr')
-        forward = []
-        backward = []
-
-        print(f"Processing rows from index 24 to {min(24 + total_rows, len(rows))}")
-
-        # Parse attendance data starting from row 24 (0-indexed)
-        processed_rows = 0
-        for i in range(24, min(24 + max(total_rows, 10), len(rows))):  # Process at least 10 rows for testing
-            cells = rows[i].find_all('td')
-            if len(cells) >= 5:
-                date = cells[1].get_text(strip=True)
-                subject_name = cells[3].get_text(strip=True)
-                attendance_status = cells[4].get_text(strip=True)
-
-                print(f"Row {i}: Date={date}, Subject={subject_name}, Status={attendance_status}")
-
-                if date and subject_name:  # Only process if we have valid data
-                    processed_rows += 1
-                    # Create attendance object
-                    attendance_object = {subject_name: attendance_status}
-
-                    # Check if this date already exists in forward array
-                    existing_entry = None
-                    for entry in forward:
-                        if entry['date'] == date:
-                            existing_entry = entry
-                            break
-
-                    if existing_entry:
-                        existing_entry['data'].append(attendance_object)
-                    else:
-                        forward.append({
-                            'date': date,
-                            'data': [attendance_object]
-                        })
-
-        print(f"Processed {processed_rows} valid rows")
-
-        # If no data found, add default message
-        if not forward:
-            current_date = datetime.now()
-            date_str = f"{current_date.day:02d} {current_date.strftime('%b')} {current_date.year}"
-            forward.append({
-                'date': date_str,
-                'data': [{'Classes for this semester is yet to begin': ''}]
-            })
+    # Find attendance table
+    tables = soup.find_all('table')
+    print(f"Found {len(tables)} tables")
 
-        # Create backward array (reverse of forward)
-        backward = forward[::-1]
+    attendance_table = None
+    for i, table in enumerate(tables):
+        rows = table.find_all('tr')
+        print(f"Table {i}: {len(rows)} rows")
+        if len(rows) > 20:  # Look for table with significant rows
+            attendance_table = table
+            print(f"Selected table {i} as attendance table")
+            break
+
+    if not attendance_table:
+        # Use the largest table if none found with > 20 rows
+        if tables:
+            attendance_table = max(tables, key=lambda t: len(t.find_all('tr')))
+            print(f"Using largest table with {len(attendance_table.find_all('tr'))} rows")
+
+    if not attendance_table:
+        raise Exception("Could not find any attendance table")
+
+    rows = attendance_table.find_all('tr')
+    forward = []
+    backward = []
+
+    print(f"Processing rows from index 24 to {min(24 + total_rows, len(rows))}")
+
+    # Parse attendance data starting from row 24 (0-indexed)
+    processed_rows = 0
+    for i in range(24, min(24 + max(total_rows, 10), len(rows))):  # Process at least 10 rows for testing
+        cells = rows[i].find_all('td')
+        if len(cells) >= 5:
+            date = cells[1].get_text(strip=True)
+            subject_name = cells[3].get_text(strip=True)
+            attendance_status = cells[4].get_text(strip=True)
+
+            print(f"Row {i}: Date={date}, Subject={subject_name}, Status={attendance_status}")
+
+            if date and subject_name:  # Only process if we have valid data
+                processed_rows += 1
+                # Create attendance object
+                attendance_object = {subject_name: attendance_status}
+
+                # Check if this date already exists in forward array
+                existing_entry = None
+                for entry in forward:
+                    if entry['date'] == date:
+                        existing_entry = entry
+                        break
 
-        # Cache the successful response for 6 hours
-        response_data = [forward, backward]
-        set_cached_data(username, 'datewise', response_data)
+                if existing_entry:
+                    existing_entry['data'].append(attendance_object)
+                else:
+                    forward.append({
+                        'date': date,
+                        'data': [attendance_object]
+                    })
+
+    print(f"Processed {processed_rows} valid rows")
+
+    # If no data found, add default message
+    if not forward:
+        current_date = datetime.now()
+        date_str = f"{current_date.day:02d} {current_date.strftime('%b')} {current_date.year}"
+        forward.append({
+            'date': date_str,
+            'data': [{'Classes for this semester is yet to begin': ''}]
+        })
+
+    return forward
+
+# Delta sync for the date-wise endpoints. A watermark is "<dates>.<hash>" where the
+# hash covers every date entry except the last one, which may still gain lectures.
+def history_chain(entries: list) -> list:
+    """Running hash per entry: chain[i] covers entries[0..i]"""
+    chain = []
+    digest = b''
+    for entry in entries:
+        payload = json.dumps(entry, sort_keys=True, ensure_ascii=False).encode()
+        digest = hashlib.blake2b(digest + payload, digest_size=8).digest()
+        chain.append(digest.hex())
+    return chain
+
+def make_watermark(chain: list, count: int) -> str:
+    """Watermark for a client holding the first `count` entries"""
+    settled = chain[count - 2] if count >= 2 else ''
+    return f"{count}.{settled}"
+
+def sync_entries(entries: list, since: Optional[str] = None, since_date: Optional[str] = None):
+    """
+    Work out what a syncing client is missing
+    Returns (entries to send, sync mode, index they replace from, new watermark)
+    """
+    chain = history_chain(entries)
+    watermark = make_watermark(chain, len(entries))
+
+    if since:
+        count_text, _, _ = since.partition('.')
+        count = int(count_text) if count_text.isdigit() else -1
+        if 0 <= count <= len(entries) and since == make_watermark(chain, count):
+            # Everything before the client's last date is unchanged; resend from that date on
+            start = max(count - 1, 0)
+            return entries[start:], 'delta', start, watermark
+        print(f"🔁 Watermark {since} diverged from server history - full resync")
+    elif since_date:
+        for start in range(len(entries) - 1, -1, -1):
+            if entries[start]['date'] == since_date:
+                return entries[start:], 'delta', start, watermark
+
+    return entries, 'full', 0, watermark
+
+class DatewiseAttendanceResponse(BaseModel):
+    success: bool
+    message: str
+    data: list = None
+    stale: bool = False
+    watermark: Optional[str] = None  # send back as `since` to only receive changes
+    sync_mode: Optional[str] = None  # "full" or "delta"
+    replace_from: Optional[int] = None  # index in the client's list where `data` starts
+
+def datewise_response(forward: list, message: str, since: Optional[str] = None, since_date: Optional[str] = None):
+    """Build a /dateWise response, trimmed to the changes when the client is syncing"""
+    entries, sync_mode, replace_from, watermark = sync_entries(forward, since, since_date)
+    return DatewiseAttendanceResponse(
+        success=True,
+        message=message,
+        data=[entries, entries[::-1]],
+        watermark=watermark,
+        sync_mode=sync_mode,
+        replace_from=replace_from
+    )
+
+async def scrape_datewise(username: str, password: str, institution_type: str, priority: str = 'interactive') -> list:
+    """
+    Log in, parse the per-lecture rows and refresh the date-wise cache and query index
+    Returns the forward date-wise list
+    """
+    forward = await scrape_portal(
+        username, password, institution_type, 'date-wise', parse_datewise_attendance, priority
+    )
 
+    # Create backward array (reverse of forward)
+    backward = forward[::-1]
+
+    # Cache the successful response for 6 hours
+    response_data = [forward, backward]
+    set_cached_data(username, 'datewise', response_data)
+    set_cached_data(username, 'index', AttendanceIndex.build(forward))
+    schedule_archive(username, password, institution_type, forward)
+
+    return forward
+
+@router.get("/dateWise")
+async def get_datewise_attendance(username: str, password: str, institution_type: str = "college",
+                                  since: Optional[str] = None, since_date: Optional[str] = None,
+                                  x_request_priority: Optional[str] = Header(None)):
+    """
+    Get date-wise attendance
+    Uses 6-hour caching to optimize Heroku dyno usage
+    Pass the last `watermark` as `since` (or the last seen date as `since_date`) to only get changes
+    """
+    try:
+        # Check if we have cached data that's less than 6 hours old
+        cached_data = get_cached_data(username, 'datewise')
+        if cached_data:
+            return datewise_response(
+                cached_data[0],
+                "Date-wise attendance retrieved from cache (less than 6 hours old)",
+                since, since_date
+            )
+
+        forward = await scrape_datewise(username, password, institution_type, x_request_priority or 'interactive')
+        return datewise_response(forward, "Date-wise attendance retrieved successfully", since, since_date)
+
+    except DeadlineExceeded as e:
+        return deadline_response(DatewiseAttendanceResponse, e, data=[])
+    except (CircuitOpenError, ScrapeRejected) as e:
+        return stale_or_unavailable(
+            DatewiseAttendanceResponse, username, 'datewise', e,
+            respond=lambda data, message: datewise_response(data[0], message, since, since_date),
+            data=[]
+        )
+    except InvalidCredentialsError as e:
+        record_failed_login(username, password, institution_type, e)
         return DatewiseAttendanceResponse(
-            success=True,
-            message="Date-wise attendance retrieved successfully",
-            data=response_data
+            success=False,
+            message=f"Failed to retrieve date-wise attendance: {str(e)}",
+            data=[]
         )
-
     except Exception as e:
         print(f"Error in dateWise endpoint: {e}")
         return DatewiseAttendanceResponse(
@@ -589,189 +1574,1017 @@ async def get_datewise_attendance(username: str, password: str, institution_type
             data=[]
         )
 
+def parse_tilldate_attendance(content: bytes) -> list:
+    """Build the cumulative present/total series from the attendance page"""
+    soup = bs4.BeautifulSoup(content, 'html.parser')
+    validate_attendance_page(soup)
+
+    # Extract total period information
+    total_period_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotperiod'})
+    not_applicable_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotaln'})
+
+    # If we can't find the specific elements, try alternative patterns
+    if not total_period_element:
+        total_period_element = soup.find('span', {'id': lambda x: x and 'lbltotperiod' in x}) or \
+                             soup.find('span', {'id': lambda x: x and 'totperiod' in x})
+
+    if not not_applicable_element:
+        not_applicable_element = soup.find('span', {'id': lambda x: x and 'lbltotaln' in x}) or \
+                               soup.find('span', {'id': lambda x: x and 'totaln' in x})
+
+    if not total_period_element or not not_applicable_element:
+        # Look for any elements with attendance-related text
+        all_spans = soup.find_all('span')
+        relevant_spans = []
+        for span in all_spans:
+            text = span.get_text(strip=True).lower()
+            if any(keyword in text for keyword in ['total', 'period', 'lecture', 'attendance']):
+                relevant_spans.append({
+                    'id': span.get('id', 'no-id'),
+                    'text': span.get_text(strip=True)
+                })
+
+        raise Exception(f"Could not find attendance data elements. Found relevant spans: {relevant_spans[:10]}")
+
+    total_period_text = total_period_element.get_text(strip=True)
+    not_applicable_text = not_applicable_element.get_text(strip=True)
+
+    # Extract numbers from text like "Total Period : 50"
+    total = 0
+    not_applicable = 0
+
+    if ':' in total_period_text:
+        try:
+            total = int(total_period_text.split(':')[1].strip())
+        except (ValueError, IndexError):
+            pass
+
+    if ':' in not_applicable_text:
+        try:
+            not_applicable = int(not_applicable_text.split(':')[1].strip())
+        except (ValueError, IndexError):
+            pass
+
+    total_rows = total + not_applicable
+
+    # Find attendance table
+    tables = soup.find_all('table')
+    attendance_table = None
+    for table in tables:
+        rows = table.find_all('tr')
+        if len(rows) > 20:  # Look for table with significant rows
+            attendance_table = table
+            break
+
+    if not attendance_table:
+        # Use the largest table if none found
+        if tables:
+            attendance_table = max(tables, key=lambda t: len(t.find_all('tr')))
+
+    if not attendance_table:
+        raise Exception("Could not find attendance table")
+
+    rows = attendance_table.find_all('tr')
+    temp = []
+    total_lectures = 0
+    present = 0
+
+    # Parse attendance data starting from row 24 (0-indexed)
+    for i in range(24, min(24 + max(total_rows, 10), len(rows))):  # Process at least 10 rows for testing
+        cells = rows[i].find_all('td')
+        if len(cells) >= 5:
+            date = cells[1].get_text(strip=True)
+            attendance_status = cells[4].get_text(strip=True)
+
+            if date and attendance_status:  # Only process if we have valid data
+                # Convert attendance status to numeric (A=0, P=1)
+                attendance_value = 0 if attendance_status.upper() == 'A' else 1
+                present += attendance_value
+                total_lectures += 1
+
+                # Check if this date already exists in temp array
+                existing_entry = None
+                for entry in temp:
+                    if entry['date'] == date:
+                        existing_entry = entry
+                        break
+
+                if not existing_entry:
+                    # Calculate percentage with 2 decimal places
+                    percentage = round((present * 100) / total_lectures, 2) if total_lectures > 0 else 100.0
+                    temp.append({
+                        'date': date,
+                        'present': present,
+                        'totalLectures': total_lectures,
+                        'percentage': percentage
+                    })
+                else:
+                    # Update existing entry
+                    percentage = round((present * 100) / total_lectures, 2) if total_lectures > 0 else 100.0
+                    existing_entry.update({
+                        'present': present,
+                        'totalLectures': total_lectures,
+                        'percentage': percentage
+                    })
+
+    # If no data found, add default entry
+    if not temp:
+        current_date = datetime.now()
+        date_str = f"{current_date.day:02d} {current_date.strftime('%b')} {current_date.year}"
+        temp.append({
+            'date': date_str,
+            'present': 0,
+            'totalLectures': 0,
+            'percentage': 100.0
+        })
+
+    return temp
+
 class TillDateAttendanceResponse(BaseModel):
     success: bool
     message: str
     data: list = None
+    stale: bool = False
+    watermark: Optional[str] = None  # send back as `since` to only receive changes
+    sync_mode: Optional[str] = None  # "full" or "delta"
+    replace_from: Optional[int] = None  # index in the client's list where `data` starts
+
+def tilldate_response(series: list, message: str, since: Optional[str] = None, since_date: Optional[str] = None):
+    """Build a /getDateWiseAttendance response with only the new cumulative tail when syncing"""
+    entries, sync_mode, replace_from, watermark = sync_entries(series, since, since_date)
+    return TillDateAttendanceResponse(
+        success=True,
+        message=message,
+        data=entries,
+        watermark=watermark,
+        sync_mode=sync_mode,
+        replace_from=replace_from
+    )
+
+async def scrape_tilldate(username: str, password: str, institution_type: str, priority: str = 'interactive') -> list:
+    """Log in, parse the per-lecture rows and refresh the till-date cache"""
+    temp = await scrape_portal(
+        username, password, institution_type, 'till-date', parse_tilldate_attendance, priority
+    )
 
-@app.get("/getDateWiseAttendance")
-async def get_tilldate_attendance(username: str, password: str, institution_type: str = "college"):
+    # Cache the successful response for 6 hours
+    set_cached_data(username, 'tilldate', temp)
+
+    return temp
+
+@router.get("/getDateWiseAttendance")
+async def get_tilldate_attendance(username: str, password: str, institution_type: str = "college",
+                                  since: Optional[str] = None, since_date: Optional[str] = None,
+                                  x_request_priority: Optional[str] = Header(None)):
     """
     Get till-date attendance
     Uses 6-hour caching to optimize Heroku dyno usage
+    Pass the last `watermark` as `since` (or the last seen date as `since_date`) to only get changes
     """
     try:
         # Check if we have cached data that's less than 6 hours old
         cached_data = get_cached_data(username, 'tilldate')
         if cached_data:
-            return TillDateAttendanceResponse(
-                success=True,
-                message="Till-date attendance retrieved from cache (less than 6 hours old)",
-                data=cached_data
+            return tilldate_response(
+                cached_data,
+                "Till-date attendance retrieved from cache (less than 6 hours old)",
+                since, since_date
             )
 
-        print(f"🔄 Fetching fresh till-date data for {username} - cache miss or expired")
-
-        # Use common login function
-        session, soup = await login_to_portal(username, password, institution_type)
-
-        # Extract total period information
-        total_period_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotperiod'})
-        not_applicable_element = soup.find('span', {'id': 'ctl00_ContentPlaceHolder1_lbltotaln'})
-
-        # If we can't find the specific elements, try alternative patterns
-        if not total_period_element:
-            total_period_element = soup.find('span', {'id': lambda x: x and 'lbltotperiod' in x}) or \
-                                 soup.find('span', {'id': lambda x: x and 'totperiod' in x})
-
-        if not not_applicable_element:
-            not_applicable_element = soup.find('span', {'id': lambda x: x and 'lbltotaln' in x}) or \
-                                   soup.find('span', {'id': lambda x: x and 'totaln' in x})
-
-        if not total_period_element or not not_applicable_element:
-            # Look for any elements with attendance-related text
-            all_spans = soup.find_all('span')
-            relevant_spans = []
-            for span in all_spans:
-                text = span.get_text(strip=True).lower()
-                if any(keyword in text for keyword in ['total', 'period', 'lecture', 'attendance']):
-                    relevant_spans.append({
-                        'id': span.get('id', 'no-id'),
-                        'text': span.get_text(strip=True)
-                    })
-
-            raise Exception(f"Could not find attendance data elements. Found relevant spans: {relevant_spans[:10]}")
+        temp = await scrape_tilldate(username, password, institution_type, x_request_priority or 'interactive')
+        return tilldate_response(temp, "Till-date attendance retrieved successfully", since, since_date)
 
-        total_period_text = total_period_element.get_text(strip=True)
-        not_applicable_text = not_applicable_element.get_text(strip=True)
+    except DeadlineExceeded as e:
+        return deadline_response(TillDateAttendanceResponse, e, data=[])
+    except (CircuitOpenError, ScrapeRejected) as e:
+        return stale_or_unavailable(
+            TillDateAttendanceResponse, username, 'tilldate', e,
+            respond=lambda data, message: tilldate_response(data, message, since, since_date),
+            data=[]
+        )
+    except InvalidCredentialsError as e:
+        record_failed_login(username, password, institution_type, e)
+        return TillDateAttendanceResponse(
+            success=False,
+            message=f"Failed to retrieve till-date attendance: {str(e)}",
+            data=[]
+        )
+    except Exception as e:
+        print(f"Error in getDateWiseAttendance endpoint: {e}")
+        return TillDateAttendanceResponse(
+            success=False,
+            message=f"Failed to retrieve till-date attendance: {str(e)}",
+            data=[]
+        )
 
-        # Extract numbers from text like "Total Period : 50"
-        total = 0
-        not_applicable = 0
+class AttendanceIndex:
+    """
+    Per-subject and overall prefix sums of present/total lectures over dates.
+    Built once per date-wise scrape so range, rollup and curve queries never
+    re-scan the lecture rows: any date range is two lookups per subject.
+    """
 
-        if ':' in total_period_text:
+    __slots__ = ('subjects', 'days', 'first_day', 'upto', 'present', 'total')
+
+    def __init__(self, subjects, days, first_day, upto, present, total):
+        self.subjects = subjects    # tuple of subject names; position len(subjects) is the overall series
+        self.days = days            # array('i') of sorted date ordinals that had lectures
+        self.first_day = first_day  # ordinal of days[0]
+        self.upto = upto            # array('I'): number of indexed days <= first_day + k
+        self.present = present      # list of array('I') prefix sums, one per subject plus overall
+        self.total = total
+
+    @classmethod
+    def build(cls, forward: list) -> 'AttendanceIndex':
+        """Build the index from a forward date-wise list"""
+        subject_positions = {}
+        per_day = {}
+        for entry in forward:
             try:
-                total = int(total_period_text.split(':')[1].strip())
-            except (ValueError, IndexError):
-                pass
+                day = datetime.strptime(entry['date'], PORTAL_DATE_FORMAT).date().toordinal()
+            except ValueError:
+                print(f"Skipping unindexable date: {entry['date']}")
+                continue
+            counts = per_day.setdefault(day, {})
+            for lecture in entry['data']:
+                for subject, status in lecture.items():
+                    # Same rule as the till-date series: blank rows are skipped, anything but A is present
+                    if not status:
+                        continue
+                    position = subject_positions.setdefault(subject, len(subject_positions))
+                    present_total = counts.setdefault(position, [0, 0])
+                    present_total[0] += 0 if status.upper() == 'A' else 1
+                    present_total[1] += 1
+
+        days = array('i', sorted(per_day))
+        series_count = len(subject_positions) + 1
+        overall = series_count - 1
+        present = [array('I', [0]) for _ in range(series_count)]
+        total = [array('I', [0]) for _ in range(series_count)]
+        for day in days:
+            counts = per_day[day]
+            day_present = sum(present_total[0] for present_total in counts.values())
+            day_total = sum(present_total[1] for present_total in counts.values())
+            for position in range(overall):
+                present_total = counts.get(position, (0, 0))
+                present[position].append(present[position][-1] + present_total[0])
+                total[position].append(total[position][-1] + present_total[1])
+            present[overall].append(present[overall][-1] + day_present)
+            total[overall].append(total[overall][-1] + day_total)
+
+        # Dense calendar lookup so finding a date's position is O(1)
+        first_day = days[0] if days else 0
+        upto = array('I')
+        if days:
+            position = 0
+            for day in range(first_day, days[-1] + 1):
+                while position < len(days) and days[position] <= day:
+                    position += 1
+                upto.append(position)
+
+        return cls(tuple(subject_positions), days, first_day, upto, present, total)
+
+    def count_upto(self, day: int) -> int:
+        """Number of indexed days on or before `day`"""
+        if not self.days or day < self.first_day:
+            return 0
+        if day - self.first_day >= len(self.upto):
+            return len(self.days)
+        return self.upto[day - self.first_day]
+
+    def position_of(self, subject: Optional[str]) -> int:
+        """Series position for a subject name (None for overall); raises KeyError if unknown"""
+        if subject is None:
+            return len(self.subjects)
+        if subject in self.subjects:
+            return self.subjects.index(subject)
+        for position, name in enumerate(self.subjects):
+            if name.lower() == subject.lower():
+                return position
+        raise KeyError(subject)
+
+    def counts(self, position: int, start_day: int, end_day: int) -> dict:
+        """Present/total for one series between two dates (inclusive)"""
+        i = self.count_upto(start_day - 1)
+        j = self.count_upto(end_day)
+        return attendance_summary(
+            self.present[position][j] - self.present[position][i],
+            self.total[position][j] - self.total[position][i]
+        )
 
-        if ':' in not_applicable_text:
-            try:
-                not_applicable = int(not_applicable_text.split(':')[1].strip())
-            except (ValueError, IndexError):
-                pass
-
-        total_rows = total + not_applicable
-
-        # Find attendance table
-        tables = soup.find_all('table')
-        attendance_table = None
-        for table in tables:
-            rows = table.find_all('tr')
-            if len(rows) > 20:  # Look for table with significant rows
-                attendance_table = table
-                break
+    def curve(self, position: int) -> list:
+        """Cumulative till-date series for one subject (or overall)"""
+        points = []
+        present, total = self.present[position], self.total[position]
+        for i, day in enumerate(self.days, 1):
+            # Only days where this series had lectures
+            if total[i] != total[i - 1]:
+                points.append({'date': format_day(day), **attendance_summary(present[i], total[i])})
+        return points
+
+def attendance_summary(present: int, total: int) -> dict:
+    return {
+        'present': present,
+        'totalLectures': total,
+        'percentage': round((present * 100) / total, 2) if total > 0 else None
+    }
 
-        if not attendance_table:
-            # Use the largest table if none found
-            if tables:
-                attendance_table = max(tables, key=lambda t: len(t.find_all('tr')))
-
-        if not attendance_table:
-            raise Exception("Could not find attendance table")
-
-        rows = attendance_table.find_all('tr')
-        temp = []
-        total_lectures = 0
-        present = 0
-
-        # Parse attendance data starting from row 24 (0-indexed)
-        for i in range(24, min(24 + max(total_rows, 10), len(rows))):  # Process at least 10 rows for testing
-            cells = rows[i].find_all('td')
-            if len(cells) >= 5:
-                date = cells[1].get_text(strip=True)
-                attendance_status = cells[4].get_text(strip=True)
-
-                if date and attendance_status:  # Only process if we have valid data
-                    # Convert attendance status to numeric (A=0, P=1)
-                    attendance_value = 0 if attendance_status.upper() == 'A' else 1
-                    present += attendance_value
-                    total_lectures += 1
-
-                    # Check if this date already exists in temp array
-                    existing_entry = None
-                    for entry in temp:
-                        if entry['date'] == date:
-                            existing_entry = entry
-                            break
-
-                    if not existing_entry:
-                        # Calculate percentage with 2 decimal places
-                        percentage = round((present * 100) / total_lectures, 2) if total_lectures > 0 else 100.0
-                        temp.append({
-                            'date': date,
-                            'present': present,
-                            'totalLectures': total_lectures,
-                            'percentage': percentage
-                        })
-                    else:
-                        # Update existing entry
-                        percentage = round((present * 100) / total_lectures, 2) if total_lectures > 0 else 100.0
-                        existing_entry.update({
-                            'present': present,
-                            'totalLectures': total_lectures,
-                            'percentage': percentage
-                        })
-
-        # If no data found, add default entry
-        if not temp:
-            current_date = datetime.now()
-            date_str = f"{current_date.day:02d} {current_date.strftime('%b')} {current_date.year}"
-            temp.append({
-                'date': date_str,
-                'present': 0,
-                'totalLectures': 0,
-                'percentage': 100.0
-            })
+def format_day(day: int) -> str:
+    return date.fromordinal(day).strftime(PORTAL_DATE_FORMAT)
 
-        # Cache the successful response for 6 hours
-        set_cached_data(username, 'tilldate', temp)
+def parse_query_date(text: str) -> int:
+    """Accept YYYY-MM-DD or the portal's '05 Aug 2025' format"""
+    for date_format in ('%Y-%m-%d', PORTAL_DATE_FORMAT):
+        try:
+            return datetime.strptime(text.strip(), date_format).date().toordinal()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{text}' - use YYYY-MM-DD")
+
+def rollup_periods(start_day: int, end_day: int, group_by: str):
+    """Yield (label, first day, last day) calendar periods covering the range"""
+    day = start_day
+    while day <= end_day:
+        current = date.fromordinal(day)
+        if group_by == 'week':
+            year, week, weekday = current.isocalendar()
+            label = f"{year}-W{week:02d}"
+            period_end = day + (7 - weekday)
+        else:
+            label = f"{current.year}-{current.month:02d}"
+            next_month = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+            period_end = next_month.toordinal() - 1
+        yield label, day, min(period_end, end_day)
+        day = period_end + 1
+
+def answer_attendance_query(index: AttendanceIndex, subject: Optional[str], start: Optional[str],
+                            end: Optional[str], group_by: Optional[str], curve: bool) -> dict:
+    """Answer a range/rollup/curve query from the prefix-sum index"""
+    position = index.position_of(subject)
+    start_day = parse_query_date(start) if start else (index.first_day if index.days else date.today().toordinal())
+    end_day = parse_query_date(end) if end else (index.days[-1] if index.days else start_day)
+    if end_day < start_day:
+        raise ValueError("end must not be before start")
+
+    result = {
+        'start': format_day(start_day),
+        'end': format_day(end_day),
+        'overall': index.counts(len(index.subjects), start_day, end_day),
+    }
+    if subject is None:
+        result['subjects'] = {
+            name: index.counts(subject_position, start_day, end_day)
+            for subject_position, name in enumerate(index.subjects)
+        }
+    else:
+        result['subject'] = index.subjects[position]
+        result['subjects'] = {index.subjects[position]: index.counts(position, start_day, end_day)}
 
-        return TillDateAttendanceResponse(
+    if group_by:
+        if group_by not in ('week', 'month'):
+            raise ValueError("group_by must be 'week' or 'month'")
+        result['rollups'] = [
+            {'period': label, 'start': format_day(first), 'end': format_day(last), **index.counts(position, first, last)}
+            for label, first, last in rollup_periods(start_day, end_day, group_by)
+        ]
+
+    if curve:
+        result['curve'] = index.curve(position)
+
+    return result
+
+class AttendanceQueryResponse(BaseModel):
+    success: bool
+    message: str
+    data: Dict[str, Any] = None
+    stale: bool = False
+
+@router.get("/attendanceQuery")
+async def query_attendance(username: str, password: str, institution_type: str = "college",
+                           subject: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                           group_by: Optional[str] = None, curve: bool = False,
+                           x_request_priority: Optional[str] = Header(None)):
+    """
+    Attendance for any date range, per subject or overall
+    `group_by=week|month` adds rollups and `curve=true` adds the till-date curve
+    Answered from a prefix-sum index built once per date-wise scrape
+    """
+    try:
+        index = get_cached_data(username, 'index')
+        if index is None:
+            cached_data = get_cached_data(username, 'datewise')
+            if cached_data:
+                index = AttendanceIndex.build(cached_data[0])
+                set_cached_data(username, 'index', index)
+            else:
+                await scrape_datewise(username, password, institution_type, x_request_priority or 'interactive')
+                index = get_cached_data(username, 'index')
+
+        return AttendanceQueryResponse(
             success=True,
-            message="Till-date attendance retrieved successfully",
-            data=temp
+            message="Attendance query answered successfully",
+            data=answer_attendance_query(index, subject, start, end, group_by, curve)
         )
 
+    except KeyError as e:
+        return AttendanceQueryResponse(success=False, message=f"Unknown subject: {e.args[0]}")
+    except ValueError as e:
+        return AttendanceQueryResponse(success=False, message=str(e))
+    except DeadlineExceeded as e:
+        return deadline_response(AttendanceQueryResponse, e)
+    except (CircuitOpenError, ScrapeRejected) as e:
+        entry = get_stale_cached_data(username, 'index')
+        if entry is None:
+            return stale_or_unavailable(AttendanceQueryResponse, username, 'index', e)
+        try:
+            data = answer_attendance_query(entry['data'], subject, start, end, group_by, curve)
+        except (KeyError, ValueError) as query_error:
+            return AttendanceQueryResponse(success=False, message=str(query_error))
+        return AttendanceQueryResponse(
+            success=True,
+            message=f"{unavailable_message(e)} - showing data last updated {entry['timestamp']}",
+            data=data,
+            stale=True
+        )
+    except InvalidCredentialsError as e:
+        record_failed_login(username, password, institution_type, e)
+        return AttendanceQueryResponse(success=False, message=f"Failed to query attendance: {str(e)}")
     except Exception as e:
-        print(f"Error in getDateWiseAttendance endpoint: {e}")
-        return TillDateAttendanceResponse(
-            success=False,
-            message=f"Failed to retrieve till-date attendance: {str(e)}",
-            data=[]
+        print(f"Error in attendanceQuery endpoint: {e}")
+        return AttendanceQueryResponse(success=False, message=f"Failed to query attendance: {str(e)}")
+
+# Append-only history archive on local disk, so past semesters survive cache
+# expiry and portal resets. Each student has a directory of semester segments
+# ("2025-odd.seg" for Jul-Dec, "2026-even.seg" for Jan-Jun). A segment is a
+# sequence of zlib-compressed columnar blocks; each block holds the complete
+# lecture list of every day that was new or changed in one scrape, and later
+# blocks win when read back. Filled from date-wise scrapes (/dateWise and
+# /attendanceQuery), which already parse every lecture row, so archiving never
+# costs an extra parse. Set HISTORY_ARCHIVE_DIR to '' to disable.
+HISTORY_ARCHIVE_DIR = os.environ.get(
+    'HISTORY_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history_archive')
+)
+ARCHIVE_BLOCK_MAGIC = b'ATH1'
+# scrypt cost for the on-disk password verifier (about 32 MiB and ~100ms per check)
+ARCHIVE_SCRYPT_N = 2 ** 15
+ARCHIVE_SCRYPT_R = 8
+ARCHIVE_SCRYPT_P = 1
+ARCHIVE_SCRYPT_MAXMEM = 64 * 1024 * 1024
+archive_verified = {}  # archive dir -> credentials key whose verifier is known to be on disk
+archive_watermarks = {}
+archive_tasks = {}    # user key -> running archive task
+archive_pending = {}  # user key -> (password, forward) of the latest scrape waiting for that task
+archive_stats = {
+    'appends': 0,
+    'days_appended': 0,
+    'bytes_written': 0,
+    'unchanged': 0,
+    'reads': 0,
+    'failed': 0,
+}
+
+def get_archive_dir(username: str, institution_type: str) -> str:
+    """Directory holding one student's semester segments"""
+    name = hashlib.sha256(f"{institution_type}:{username}".encode()).hexdigest()[:32]
+    return os.path.join(HISTORY_ARCHIVE_DIR, name)
+
+def semester_label(day: int) -> str:
+    """Odd semesters run Jul-Dec, even semesters Jan-Jun"""
+    current = date.fromordinal(day)
+    return f"{current.year}-{'odd' if current.month >= 7 else 'even'}"
+
+def group_lectures_by_day(forward: list) -> dict:
+    """
+    {day ordinal: ((subject, status), ...)} from a forward date-wise list
+    Rows with a blank status are left out, which also drops the "Classes for this
+    semester is yet to begin" placeholder returned when the portal has no rows
+    """
+    days = {}
+    for entry in forward:
+        lectures = [
+            (subject, status) for lecture in entry['data'] for subject, status in lecture.items() if status
+        ]
+        if not lectures:
+            continue
+        try:
+            day = datetime.strptime(entry['date'], PORTAL_DATE_FORMAT).date().toordinal()
+        except ValueError:
+            print(f"Skipping unarchivable date: {entry['date']}")
+            continue
+        days.setdefault(day, []).extend(lectures)
+    return {day: tuple(lectures) for day, lectures in days.items()}
+
+def encode_archive_block(days: dict) -> bytes:
+    """Pack {day: lectures} as one compressed block: day deltas, lecture counts, subject and status codes"""
+    subject_table = {}
+    status_table = {}
+    day_deltas = array('i')
+    lecture_counts = array('H')
+    subject_codes = array('H')
+    status_codes = bytearray()
+
+    previous_day = 0
+    for day in sorted(days):
+        day_deltas.append(day - previous_day)
+        previous_day = day
+        lecture_counts.append(len(days[day]))
+        for subject, status in days[day]:
+            subject_codes.append(subject_table.setdefault(subject, len(subject_table)))
+            status_codes.append(status_table.setdefault(status, len(status_table)))
+
+    meta = json.dumps({
+        'scraped': datetime.now().isoformat(),
+        'subjects': list(subject_table),
+        'statuses': list(status_table),
+        'days': len(day_deltas),
+        'lectures': len(subject_codes),
+    }, ensure_ascii=False).encode()
+    payload = zlib.compress(
+        struct.pack('<I', len(meta)) + meta
+        + day_deltas.tobytes() + lecture_counts.tobytes() + subject_codes.tobytes() + bytes(status_codes)
+    )
+    return ARCHIVE_BLOCK_MAGIC + struct.pack('<I', len(payload)) + payload
+
+def decode_archive_block(payload: bytes):
+    """Inverse of encode_archive_block; returns (meta, {day: lectures})"""
+    raw = zlib.decompress(payload)
+    (meta_length,) = struct.unpack_from('<I', raw)
+    offset = 4 + meta_length
+    meta = json.loads(raw[4:offset])
+
+    columns = []
+    for typecode, count in (('i', meta['days']), ('H', meta['days']), ('H', meta['lectures'])):
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(raw[offset:offset + size])
+        columns.append(column)
+        offset += size
+    day_deltas, lecture_counts, subject_codes = columns
+    status_codes = raw[offset:offset + meta['lectures']]
+
+    subjects, statuses = meta['subjects'], meta['statuses']
+    days = {}
+    day = 0
+    lecture = 0
+    for delta, count in zip(day_deltas, lecture_counts):
+        day += delta
+        days[day] = tuple(
+            (subjects[subject_codes[i]], statuses[status_codes[i]]) for i in range(lecture, lecture + count)
+        )
+        lecture += count
+    return meta, days
+
+def read_archive_segment(path: str) -> dict:
+    """Replay a segment's blocks into {day: lectures}; a torn trailing block is ignored"""
+    return scan_archive_segment(path)[0]
+
+def scan_archive_segment(path: str):
+    """
+    Replay a segment's blocks; returns ({day: lectures}, byte length of the intact blocks)
+    Anything after the first damaged block (e.g. a write cut short by a crash) is not part of the segment
+    """
+    days = {}
+    with open(path, 'rb') as f:
+        content = f.read()
+    archive_stats['reads'] += 1
+
+    offset = 0
+    while offset + 8 <= len(content):
+        magic, length = struct.unpack_from('<4sI', content, offset)
+        payload = content[offset + 8:offset + 8 + length]
+        if magic != ARCHIVE_BLOCK_MAGIC or len(payload) != length:
+            print(f"⚠️ Ignoring damaged archive data in {path} at byte {offset}")
+            break
+        try:
+            _, block_days = decode_archive_block(payload)
+        except (zlib.error, ValueError, KeyError, IndexError, struct.error) as e:
+            print(f"⚠️ Ignoring damaged archive block in {path} at byte {offset}: {e}")
+            break
+        days.update(block_days)
+        offset += 8 + length
+    return days, offset
+
+def make_archive_verifier(password: str, salt: bytes, n: int = ARCHIVE_SCRYPT_N, r: int = ARCHIVE_SCRYPT_R,
+                          p: int = ARCHIVE_SCRYPT_P) -> str:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=ARCHIVE_SCRYPT_MAXMEM).hex()
+
+def check_archive_verifier(archive_dir: str, password: str) -> bool:
+    """True if the password matches the hash stored next to the archive"""
+    try:
+        with open(os.path.join(archive_dir, 'verifier.json')) as f:
+            stored = json.load(f)
+        expected = make_archive_verifier(password, bytes.fromhex(stored['salt']), stored['n'], stored['r'], stored['p'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    return hmac.compare_digest(expected, stored['hash'])
+
+def update_archive_verifier(archive_dir: str, username: str, password: str, institution_type: str) -> None:
+    """
+    Keep a salted scrypt hash of the password next to the archive so it can be opened
+    while the portal is down; only rewritten when the stored hash doesn't match
+    """
+    credentials_key = get_credentials_key(username, password, institution_type)
+    if archive_verified.get(archive_dir) == credentials_key:
+        return
+    if not check_archive_verifier(archive_dir, password):
+        salt = os.urandom(16)
+        path = os.path.join(archive_dir, 'verifier.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({
+                'salt': salt.hex(),
+                'n': ARCHIVE_SCRYPT_N,
+                'r': ARCHIVE_SCRYPT_R,
+                'p': ARCHIVE_SCRYPT_P,
+                'hash': make_archive_verifier(password, salt),
+            }, f)
+        os.replace(path + '.tmp', path)
+    archive_verified[archive_dir] = credentials_key
+
+def append_history(username: str, password: str, institution_type: str, forward: list) -> int:
+    """
+    Append the days of a scrape that the archive doesn't have yet (or that changed)
+    Returns the number of days written
+    """
+    days = group_lectures_by_day(forward)
+    if not days:
+        return 0
+
+    archive_dir = get_archive_dir(username, institution_type)
+    os.makedirs(archive_dir, exist_ok=True)
+    update_archive_verifier(archive_dir, username, password, institution_type)
+
+    path = os.path.join(archive_dir, f"{semester_label(min(days))}.seg")
+    archived, intact_bytes = scan_archive_segment(path) if os.path.exists(path) else ({}, 0)
+    changed = {day: lectures for day, lectures in days.items() if archived.get(day) != lectures}
+    if not changed:
+        archive_stats['unchanged'] += 1
+        return 0
+
+    block = encode_archive_block(changed)
+    with open(path, 'ab') as f:
+        if f.tell() > intact_bytes:
+            # Drop a torn tail first, or every later block would sit behind it unreadable
+            print(f"⚠️ Truncating {f.tell() - intact_bytes} damaged bytes from {path}")
+            f.truncate(intact_bytes)
+        f.write(block)
+    archive_stats['appends'] += 1
+    archive_stats['days_appended'] += len(changed)
+    archive_stats['bytes_written'] += len(block)
+    print(f"🗄️ Archived {len(changed)} days for {username} in {os.path.basename(path)} ({len(block)} bytes)")
+    return len(changed)
+
+async def archive_scrape(username: str, password: str, institution_type: str, forward: list) -> None:
+    """
+    Archive date-wise scrapes for one user in the background, one at a time
+    Scrapes that finish meanwhile replace each other in archive_pending; only the latest is appended next
+    """
+    user_key = get_user_key(username, institution_type)
+    try:
+        while forward is not None:
+            try:
+                watermark = history_chain(forward)[-1] if forward else None
+                if watermark is not None and archive_watermarks.get(user_key) != watermark:
+                    await asyncio.to_thread(append_history, username, password, institution_type, forward)
+                    archive_watermarks[user_key] = watermark
+            except Exception as e:
+                archive_stats['failed'] += 1
+                print(f"⚠️ Could not archive history for {username}: {e}")
+            password, forward = archive_pending.pop(user_key, (password, None))
+    finally:
+        archive_tasks.pop(user_key, None)
+
+def schedule_archive(username: str, password: str, institution_type: str, forward: list) -> None:
+    """Start archiving a date-wise scrape without delaying the response"""
+    if not HISTORY_ARCHIVE_DIR:
+        return
+    user_key = get_user_key(username, institution_type)
+    if user_key in archive_tasks:
+        archive_pending[user_key] = (password, forward)
+        return
+    archive_tasks[user_key] = asyncio.create_task(archive_scrape(username, password, institution_type, forward))
+
+def load_history(username: str, institution_type: str) -> dict:
+    """{semester label: {day: lectures}} for every archived semester"""
+    archive_dir = get_archive_dir(username, institution_type)
+    if not os.path.isdir(archive_dir):
+        return {}
+    return {
+        name[:-len('.seg')]: read_archive_segment(os.path.join(archive_dir, name))
+        for name in sorted(os.listdir(archive_dir)) if name.endswith('.seg')
+    }
+
+def summarize_semester(label: str, days: dict) -> dict:
+    """Overall and per-subject attendance for one archived semester"""
+    counts = {}
+    for lectures in days.values():
+        for subject, status in lectures:
+            # Same rule as the till-date series: blank rows are skipped, anything but A is present
+            if not status:
+                continue
+            present_total = counts.setdefault(subject, [0, 0])
+            present_total[0] += 0 if status.upper() == 'A' else 1
+            present_total[1] += 1
+
+    return {
+        'semester': label,
+        'start': format_day(min(days)) if days else None,
+        'end': format_day(max(days)) if days else None,
+        'days': len(days),
+        'overall': attendance_summary(sum(c[0] for c in counts.values()), sum(c[1] for c in counts.values())),
+        'subjects': {subject: attendance_summary(*present_total) for subject, present_total in counts.items()},
+    }
+
+def semester_forward(days: dict) -> list:
+    """Archived days in the /dateWise forward shape"""
+    return [
+        {'date': format_day(day), 'data': [{subject: status} for subject, status in days[day]]}
+        for day in sorted(days)
+    ]
+
+def answer_history_query(history: dict, semester: Optional[str], subject: Optional[str]) -> dict:
+    """Semester summaries and a per-subject trend, or one semester's full date-wise history"""
+    if semester is not None:
+        if semester not in history:
+            raise KeyError(f"semester {semester}")
+        return {**summarize_semester(semester, history[semester]), 'datewise': semester_forward(history[semester])}
+
+    summaries = [summarize_semester(label, days) for label, days in history.items()]
+    result = {'semesters': summaries}
+    if subject is not None:
+        trend = []
+        for summary in summaries:
+            for name, counts in summary['subjects'].items():
+                if name.lower() == subject.lower():
+                    trend.append({'semester': summary['semester'], 'subject': name, **counts})
+        if not trend:
+            raise KeyError(f"subject {subject}")
+        result['trend'] = trend
+    return result
+
+# Checking the on-disk verifier costs a full scrypt (about 32 MiB), so only a couple
+# run at once, and wrong passwords count as failed logins like a portal rejection does
+ARCHIVE_VERIFY_CONCURRENCY = 2
+ARCHIVE_MAX_FAILED_ATTEMPTS = 5
+archive_verify_slots = asyncio.Semaphore(ARCHIVE_VERIFY_CONCURRENCY)
+
+def history_unauthorized(message: str) -> JSONResponse:
+    return JSONResponse(status_code=401, content={"success": False, "message": message})
+
+async def verify_archive_password(username: str, password: str, institution_type: str) -> Optional[JSONResponse]:
+    """Check the password against the archive's verifier; returns an error response if it doesn't match"""
+    cached_failure = get_failed_login(username, password, institution_type)
+    if cached_failure:
+        return history_unauthorized(str(cached_failure))
+
+    attempts = failed_login_attempts.get(get_user_key(username, institution_type))
+    now = time.monotonic()
+    if attempts is not None and attempts['expires_at'] > now and attempts['count'] >= ARCHIVE_MAX_FAILED_ATTEMPTS:
+        retry_after = int(attempts['expires_at'] - now) + 1
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "message": f"Too many failed attempts. Please try again in {retry_after} seconds."},
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    archive_dir = get_archive_dir(username, institution_type)
+    if not os.path.exists(os.path.join(archive_dir, 'verifier.json')):
+        return history_unauthorized("Log in before opening attendance history")
+
+    async with archive_verify_slots:
+        matches = await asyncio.to_thread(check_archive_verifier, archive_dir, password)
+    if not matches:
+        record_failed_login(username, password, institution_type, InvalidCredentialsError("Invalid credentials"))
+        return history_unauthorized("Invalid credentials")
+
+    record_successful_login(username, password, institution_type)
+    return None
+
+class HistoryResponse(BaseModel):
+    success: bool
+    message: str
+    data: Dict[str, Any] = None
+
+@router.get("/history")
+async def attendance_history(username: str, password: str, institution_type: str = "college",
+                             semester: Optional[str] = None, subject: Optional[str] = None):
+    """
+    Archived attendance across semesters, served from local disk without the portal
+    `subject` adds a per-semester trend; `semester` (e.g. 2025-odd) returns that semester's date-wise history
+    """
+    if not HISTORY_ARCHIVE_DIR:
+        return HistoryResponse(success=False, message="History archive is disabled")
+
+    if not is_verified_login(username, password, institution_type):
+        rejection = await verify_archive_password(username, password, institution_type)
+        if rejection is not None:
+            return rejection
+
+    try:
+        history = await asyncio.to_thread(load_history, username, institution_type)
+        if not history:
+            return HistoryResponse(success=True, message="No archived attendance yet", data={'semesters': []})
+        return HistoryResponse(
+            success=True,
+            message="Attendance history retrieved from archive",
+            data=answer_history_query(history, semester, subject)
         )
+    except KeyError as e:
+        return HistoryResponse(success=False, message=f"Unknown {e.args[0]}")
+    except Exception as e:
+        print(f"Error in history endpoint: {e}")
+        return HistoryResponse(success=False, message=f"Failed to read attendance history: {str(e)}")
+
+# Server-Sent Events: one stream per logged-in app session. Whenever a scrape
+# for the user refreshes a cache, subscribers get only what changed since the
+# version they last received.
+SSE_KEEPALIVE_SECONDS = 25  # below Heroku's 55s idle connection timeout
+SSE_MAX_STREAMS_PER_USER = 3
+event_subscribers = {}
+event_versions = {}
+event_stats = {
+    'published': 0,
+    'delivered': 0,
+    'coalesced': 0,
+}
+
+class UpdateMailbox:
+    """
+    Pending updates for one stream, at most one per endpoint.
+    A slow client only needs the newest state of each endpoint (diffs are computed
+    on delivery), so a newer update replaces the pending one for the same endpoint
+    and never pushes out another endpoint's.
+    """
+
+    def __init__(self):
+        self.pending = {}  # endpoint -> (version, data)
+        self.ready = asyncio.Event()
+
+    def put(self, version: int, endpoint: str, data) -> None:
+        if endpoint in self.pending:
+            event_stats['coalesced'] += 1
+        self.pending[endpoint] = (version, data)
+        self.ready.set()
+
+    async def get(self):
+        """Wait for the oldest pending update; returns (version, endpoint, data)"""
+        while not self.pending:
+            self.ready.clear()
+            await self.ready.wait()
+        endpoint = min(self.pending, key=lambda name: self.pending[name][0])
+        version, data = self.pending.pop(endpoint)
+        return version, endpoint, data
+
+def publish_update(username: str, endpoint: str, data) -> None:
+    """Hand a refreshed cache entry to every stream the user has open"""
+    if endpoint not in ('attendance', 'datewise', 'tilldate'):
+        return
+
+    event_versions[username] = event_versions.get(username, 0) + 1
+    event_stats['published'] += 1
+    for mailbox in event_subscribers.get(username, ()):
+        mailbox.put(event_versions[username], endpoint, data)
+
+def diff_subject_attendance(previous: Optional[dict], current: dict) -> dict:
+    """Subjects whose numbers changed, and subjects that disappeared"""
+    previous = previous or {}
+    return {
+        'changed': {subject: stats for subject, stats in current.items() if previous.get(subject) != stats},
+        'removed': [subject for subject in previous if subject not in current],
+    }
 
-@app.get("/")
+def format_event(version: int, event: str, payload: dict) -> str:
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+async def update_stream(request: Request, username: str, watermarks: dict):
+    """Yield SSE frames for one subscriber until the client disconnects"""
+    delivered_attendance = get_cached_data(username, 'attendance')
+    delivered_heads = {}
+    mailbox = UpdateMailbox()
+    # Registered here rather than in the endpoint, so a client that disconnects before
+    # the body starts never leaves a subscription behind
+    try:
+        event_subscribers.setdefault(username, set()).add(mailbox)
+        print(f"📡 {username} subscribed to updates ({len(event_subscribers[username])} open)")
+        yield format_event(event_versions.get(username, 0), 'ready', {'username': username})
+        while True:
+            try:
+                version, endpoint, data = await asyncio.wait_for(mailbox.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            if endpoint == 'attendance':
+                diff = diff_subject_attendance(delivered_attendance, data)
+                delivered_attendance = data
+                if not diff['changed'] and not diff['removed']:
+                    continue
+                payload = {'version': version, **diff}
+            else:
+                # Same delta format as /dateWise and /getDateWiseAttendance with `since`
+                entries = data[0] if endpoint == 'datewise' else data
+                chain = history_chain(entries)
+                head = chain[-1] if chain else None
+                if head is not None and head == delivered_heads.get(endpoint):
+                    continue
+                changed, sync_mode, replace_from, watermark = sync_entries(entries, watermarks.get(endpoint))
+                watermarks[endpoint] = watermark
+                delivered_heads[endpoint] = head
+                payload = {
+                    'version': version,
+                    'sync_mode': sync_mode,
+                    'replace_from': replace_from,
+                    'watermark': watermark,
+                    'data': [changed, changed[::-1]] if endpoint == 'datewise' else changed,
+                }
+
+            event_stats['delivered'] += 1
+            yield format_event(version, endpoint, payload)
+    finally:
+        subscribers = event_subscribers.get(username)
+        if subscribers is not None:
+            subscribers.discard(mailbox)
+            if not subscribers:
+                del event_subscribers[username]
+
+@router.get("/events")
+async def subscribe_updates(request: Request, username: str, password: str, institution_type: str = "college",
+                            datewise_since: Optional[str] = None, tilldate_since: Optional[str] = None):
+    """
+    Server-Sent Events stream of attendance updates for a logged-in user
+    Events: `attendance` (changed/removed subjects), `datewise` and `tilldate` (delta
+    sync payloads); pass the last watermarks so the first update is already a delta
+    """
+    if not is_verified_login(username, password, institution_type):
+        return JSONResponse(status_code=401, content={
+            "success": False,
+            "message": "Log in before subscribing to updates"
+        })
+
+    if len(event_subscribers.get(username, ())) >= SSE_MAX_STREAMS_PER_USER:
+        return JSONResponse(status_code=429, content={
+            "success": False,
+            "message": "Too many open update streams for this user"
+        })
+
+    watermarks = {'datewise': datewise_since, 'tilldate': tilldate_since}
+    return StreamingResponse(
+        update_stream(request, username, watermarks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/")
 async def root():
     return {"message": "College Attendance Scraper API is running"}
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     cache_stats = {
         "attendance_cache_entries": len(attendance_cache),
         "datewise_cache_entries": len(datewise_cache),
+        "datewise_cache_bytes": sum(
+            entry['data'].nbytes() for entry in datewise_cache.values() if isinstance(entry['data'], CompactDatewise)
+        ),
         "tilldate_cache_entries": len(tilldate_cache),
+        "index_cache_entries": len(index_cache),
+        "failed_login_entries": len(failed_login_cache),
+        "failed_login_hits": failed_login_stats['hits'],
+        "failed_login_users": len(failed_login_attempts),
         "cache_duration_hours": CACHE_DURATION_HOURS,
         "server_time": datetime.now().isoformat()
     }
 
+    parse_info = dict(parse_stats)
+    parse_info["pool_workers"] = PARSE_POOL_WORKERS
+    parse_info["inline_max_bytes"] = PARSE_INLINE_MAX_BYTES
+
     return {
         "status": "healthy",
         "message": "API is running with 6-hour caching for Heroku optimization",
-        "cache_info": cache_stats
+        "cache_info": cache_stats,
+        "parse_info": parse_info,
+        "deadline_info": {
+            "budget_seconds": LOGIN_DEADLINE_SECONDS,
+            "exceeded": deadline_stats['exceeded']
+        },
+        "circuit_info": {host: breaker.stats() for host, breaker in circuit_breakers.items()},
+        "admission_info": scrape_admission.stats(),
+        "startup_info": startup_stats,
+        "history_info": {
+            "enabled": bool(HISTORY_ARCHIVE_DIR),
+            "pending": len(archive_tasks),
+            **archive_stats
+        },
+        "event_info": {
+            "users_subscribed": len(event_subscribers),
+            "open_streams": sum(len(queues) for queues in event_subscribers.values()),
+            **event_stats
+        }
     }
 
-@app.post("/clear-cache")
+@router.post("/clear-cache")
 async def clear_cache():
     """
     Clear all cached data (admin endpoint)
@@ -781,12 +2594,18 @@ async def clear_cache():
     old_counts = {
         "attendance": len(attendance_cache),
         "datewise": len(datewise_cache),
-        "tilldate": len(tilldate_cache)
+        "tilldate": len(tilldate_cache),
+        "index": len(index_cache),
+        "failed_logins": len(failed_login_cache)
     }
 
     attendance_cache.clear()
     datewise_cache.clear()
     tilldate_cache.clear()
+    index_cache.clear()
+    failed_login_cache.clear()
+    failed_login_attempts.clear()
+    verified_logins.clear()
 
     return {
         "success": True,
@@ -794,7 +2613,7 @@ async def clear_cache():
         "cleared_entries": old_counts
     }
 
-@app.post("/test-login")
+@router.post("/test-login")
 async def test_login():
     """
     Test endpoint that returns dummy data without web scraping
@@ -816,5 +2635,40 @@ async def test_login():
         }
     )
 
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    global prewarm_task
+    if PREWARM_PORTALS:
+        # Keep a reference so the task isn't garbage-collected mid-run
+        prewarm_task = asyncio.create_task(prewarm())
+    yield
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+        prewarm_task = None
+    close_prewarmed_logins()
+    shutdown_parse_pool()
+
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI app
+    Usable directly with `uvicorn --factory main:create_app`
+    """
+    application = FastAPI(title="College Attendance Scraper", version="1.0.0", lifespan=lifespan)
+
+    # Add CORS middleware to allow Flutter app to make requests
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allow all origins for development
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["*"],
+    )
+    application.include_router(router)
+    return application
+
+app = create_app()
+startup_stats['import_ms'] = round((time.perf_counter() - MODULE_IMPORT_STARTED) * 1000, 1)
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
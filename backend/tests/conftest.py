@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the app module directly, like uvicorn does from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
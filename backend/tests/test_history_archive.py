@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+import main
+
+
+def make_forward(days: int) -> list:
+    subjects = ['ADA', 'COA', 'DBMS']
+    return [
+        {
+            'date': f"{day:02d} Aug 2025",
+            'data': [{subject: 'A' if (day + i) % 4 == 0 else 'P'} for i, subject in enumerate(subjects)],
+        }
+        for day in range(1, days + 1)
+    ]
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'HISTORY_ARCHIVE_DIR', str(tmp_path))
+    monkeypatch.setattr(main, 'archive_verified', {})
+    return tmp_path
+
+
+def segment_path(username: str = 'student') -> str:
+    return os.path.join(main.get_archive_dir(username, 'college'), '2025-odd.seg')
+
+
+def test_block_round_trip():
+    days = main.group_lectures_by_day(make_forward(10))
+    meta, decoded = main.decode_archive_block(main.encode_archive_block(days)[8:])
+    assert decoded == days
+    assert meta['days'] == 10 and meta['lectures'] == 30
+
+
+def test_append_and_read_back(archive_dir):
+    forward = make_forward(5)
+    assert main.append_history('student', 'secret', 'college', forward) == 5
+
+    history = main.load_history('student', 'college')
+    assert list(history) == ['2025-odd']
+    assert main.semester_forward(history['2025-odd']) == forward
+
+
+def test_unchanged_scrape_is_a_no_op(archive_dir):
+    forward = make_forward(5)
+    main.append_history('student', 'secret', 'college', forward)
+    size = os.path.getsize(segment_path())
+
+    assert main.append_history('student', 'secret', 'college', forward) == 0
+    assert os.path.getsize(segment_path()) == size
+
+
+def test_only_changed_days_are_appended(archive_dir):
+    forward = make_forward(5)
+    main.append_history('student', 'secret', 'college', forward)
+
+    forward[-1] = {'date': forward[-1]['date'], 'data': [{'ADA': 'A'}]}
+    forward.append({'date': '06 Aug 2025', 'data': [{'COA': 'P'}]})
+    assert main.append_history('student', 'secret', 'college', forward) == 2
+    assert main.semester_forward(main.load_history('student', 'college')['2025-odd']) == forward
+
+
+def test_torn_tail_is_truncated_before_appending(archive_dir):
+    forward = make_forward(5)
+    main.append_history('student', 'secret', 'college', forward)
+    intact_size = os.path.getsize(segment_path())
+
+    # A crash half-way through writing the next block
+    torn_block = main.encode_archive_block(main.group_lectures_by_day(make_forward(8)))
+    with open(segment_path(), 'ab') as f:
+        f.write(torn_block[:len(torn_block) // 2])
+    assert main.read_archive_segment(segment_path()) == main.group_lectures_by_day(forward)
+
+    forward = make_forward(8)
+    assert main.append_history('student', 'secret', 'college', forward) == 3
+    assert main.scan_archive_segment(segment_path())[1] == os.path.getsize(segment_path())
+    assert os.path.getsize(segment_path()) > intact_size
+    assert main.semester_forward(main.load_history('student', 'college')['2025-odd']) == forward
+
+    # Later scrapes see the new days and write nothing more
+    assert main.append_history('student', 'secret', 'college', forward) == 0
+
+
+def test_placeholder_page_is_not_archived(archive_dir):
+    placeholder = [{'date': '19 Oct 2025', 'data': [{'Classes for this semester is yet to begin': ''}]}]
+    assert main.append_history('student', 'secret', 'college', placeholder) == 0
+    assert main.load_history('student', 'college') == {}
@@ -1,130 +1,307 @@
 #!/usr/bin/env python3
 """
-Debug script to test LNCT portal login with detailed inspection
+Profiling tool for the LNCT portal login and attendance extraction
+
+Runs the backend's real login_to_portal + parsing path (live), or replays saved
+HTML from disk with no network (replay), and writes a HAR-like JSON trace with
+per-request timing, response sizes, parse times and cProfile/tracemalloc hot
+spots. Traces from different runs can be compared offline.
+
+Usage:
+    python debug_login.py live --username ID --password PW [--institution-type college]
+                               [--repeat 5] [--save-html pages/] [--out trace.json]
+    python debug_login.py replay pages/ [--repeat 5] [--out trace.json]
+    python debug_login.py compare before.json after.json
+
+Saved pages contain the student's attendance record - keep them private.
 """
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import asyncio
+import cProfile
 import json
+import os
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import main as backend  # noqa: E402
+
+TRACE_VERSION = 1
+HOT_SPOTS = 15
+ATTENDANCE_PARSERS = [
+    backend.parse_subject_attendance,
+    backend.parse_datewise_attendance,
+    backend.parse_tilldate_attendance,
+]
+
+
+def profile_hot_spots(profiler: cProfile.Profile, limit: int = HOT_SPOTS) -> list:
+    """Top functions by own time, as plain data"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': function,
+            'location': f"{filename}:{line}",
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['tottime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def memory_hot_spots(snapshot: tracemalloc.Snapshot, limit: int = 10) -> list:
+    return [
+        {
+            'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size_kb': round(stat.size / 1024, 1),
+            'count': stat.count,
+        }
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+
+
+def run_parsers(login_page: bytes, attendance_page: bytes, repeat: int) -> list:
+    """Time each extraction parser in-process; median of `repeat` runs"""
+    results = []
+    jobs = [(backend.parse_login_form, login_page)] if login_page else []
+    jobs += [(parser, attendance_page) for parser in ATTENDANCE_PARSERS]
+    for parser, content in jobs:
+        timings = []
+        result = None
+        error = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            try:
+                result = parser(content)
+            except Exception as e:
+                error = str(e)
+            timings.append((time.perf_counter() - started) * 1000)
+        results.append({
+            'parser': parser.__name__,
+            'bytes': len(content),
+            'ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'runs': repeat,
+            'result_items': len(result) if result is not None else 0,
+            'error': error,
+        })
+    return results
 
-def debug_login_process():
-    session = requests.Session()
-    
-    # Headers to mimic a real browser
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
+
+def profile_run(work) -> dict:
+    """
+    Run `work()` once under cProfile and tracemalloc for hot spots and peak memory
+    Both slow the code down a lot, so timings are taken in a separate, unprofiled pass
+    """
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        work()
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'profile': profile_hot_spots(profiler),
+        'memory': {
+            'peak_kb': round(peak / 1024, 1),
+            'top': memory_hot_spots(snapshot),
+        },
     }
-    
-    print("=== STEP 1: Accessing Login Page ===")
-    login_url = "https://portal.lnct.ac.in/Accsoft2/StudentLogin.aspx"
-    
+
+
+def live_run(args) -> dict:
+    """Real portal login via the backend, recording every request"""
+    username = args.username or os.environ.get('ATTENDANCE_USERNAME')
+    password = args.password or os.environ.get('ATTENDANCE_PASSWORD')
+    if not username or not password:
+        sys.exit("live mode needs --username/--password (or ATTENDANCE_USERNAME/ATTENDANCE_PASSWORD)")
+
+    # Parse in this process (no pool start-up in the timings) and import bs4 up front
+    backend.PARSE_POOL_WORKERS = 0
+    backend.warm_parser()
+    entries = []
+    pages = {}
+
+    def observe(event):
+        if event['type'] == 'request':
+            pages[event['step']] = event.pop('response').content
+            event['started'] = event.pop('started_at')
+        event['ms'] = round(event['ms'], 3)
+        entries.append(event)
+
+    backend.trace_observer = observe
+    started = time.perf_counter()
     try:
-        response = session.get(login_url, headers=headers)
-        print(f"Status Code: {response.status_code}")
-        print(f"URL after redirect: {response.url}")
-        print(f"Content Length: {len(response.text)}")
-        
-        # Parse HTML to find form elements
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find all input fields
-        print("\n=== FORM FIELDS FOUND ===")
-        inputs = soup.find_all('input')
-        for inp in inputs:
-            input_type = inp.get('type', '')
-            input_name = inp.get('name', '')
-            input_value = inp.get('value', '')
-            if input_name:
-                print(f"Name: {input_name}, Type: {input_type}, Value: {input_value[:50] if input_value else 'None'}")
-        
-        # Find form action
-        forms = soup.find_all('form')
-        print(f"\n=== FORMS FOUND ({len(forms)}) ===")
-        for i, form in enumerate(forms):
-            action = form.get('action', '')
-            method = form.get('method', '')
-            print(f"Form {i+1}: Action='{action}', Method='{method}'")
-        
-        # Check if we can find specific student login fields
-        student_username = soup.find('input', {'name': 'ctl00$cph1$txtStuUser'}) or \
-                          soup.find('input', {'id': 'txtStuUser'}) or \
-                          soup.find('input', {'name': 'txtStuUser'})
-        
-        student_password = soup.find('input', {'name': 'ctl00$cph1$txtStuPsw'}) or \
-                          soup.find('input', {'id': 'txtStuPsw'}) or \
-                          soup.find('input', {'name': 'txtStuPsw'})
-        
-        student_login_btn = soup.find('input', {'name': 'ctl00$cph1$btnStuLogin'}) or \
-                           soup.find('input', {'id': 'btnStuLogin'}) or \
-                           soup.find('input', {'name': 'btnStuLogin'})
-        
-        print(f"\n=== STUDENT LOGIN FIELDS ===")
-        print(f"Username field found: {student_username is not None}")
-        if student_username:
-            print(f"  Name: {student_username.get('name')}")
-            print(f"  ID: {student_username.get('id')}")
-            
-        print(f"Password field found: {student_password is not None}")
-        if student_password:
-            print(f"  Name: {student_password.get('name')}")
-            print(f"  ID: {student_password.get('id')}")
-            
-        print(f"Login button found: {student_login_btn is not None}")
-        if student_login_btn:
-            print(f"  Name: {student_login_btn.get('name')}")
-            print(f"  ID: {student_login_btn.get('id')}")
-            print(f"  Value: {student_login_btn.get('value')}")
-        
-        # Get required hidden fields
-        viewstate = soup.find('input', {'name': '__VIEWSTATE'})
-        eventvalidation = soup.find('input', {'name': '__EVENTVALIDATION'})
-        viewstategenerator = soup.find('input', {'name': '__VIEWSTATEGENERATOR'})
-        
-        print(f"\n=== ASP.NET HIDDEN FIELDS ===")
-        print(f"__VIEWSTATE found: {viewstate is not None}")
-        print(f"__EVENTVALIDATION found: {eventvalidation is not None}")
-        print(f"__VIEWSTATEGENERATOR found: {viewstategenerator is not None}")
-        
-        # Save the page for manual inspection
-        with open('/tmp/login_page_debug.html', 'w', encoding='utf-8') as f:
-            f.write(response.text)
-        print(f"\nLogin page saved to: /tmp/login_page_debug.html")
-        
-        # Check if there are any JavaScript requirements
-        scripts = soup.find_all('script')
-        print(f"\n=== JAVASCRIPT ANALYSIS ===")
-        print(f"Total script tags found: {len(scripts)}")
-        
-        js_validation = False
-        for script in scripts:
-            if script.string and ('validation' in script.string.lower() or 'postback' in script.string.lower()):
-                js_validation = True
-                break
-        
-        print(f"Potential JS validation detected: {js_validation}")
-        
-        return {
-            'success': True,
-            'status_code': response.status_code,
-            'url': response.url,
-            'has_student_fields': all([student_username, student_password, student_login_btn]),
-            'has_asp_fields': all([viewstate, eventvalidation]),
-            'form_data': {
-                'viewstate': viewstate['value'] if viewstate else None,
-                'eventvalidation': eventvalidation['value'] if eventvalidation else None,
-                'viewstategenerator': viewstategenerator['value'] if viewstategenerator else None,
-            } if all([viewstate, eventvalidation]) else None
-        }
-        
-    except Exception as e:
-        print(f"Error accessing login page: {e}")
-        return {'success': False, 'error': str(e)}
+        deadline = backend.Deadline(args.deadline)
+        _, attendance_page = asyncio.run(backend.login_to_portal(username, password, args.institution_type, deadline))
+    finally:
+        backend.trace_observer = None
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    login_page = pages.get('login page', b'')
+    parses = run_parsers(login_page, attendance_page, args.repeat)
+    profile = profile_run(lambda: run_parsers(login_page, attendance_page, 1))
+
+    if args.save_html:
+        save_pages(args.save_html, login_page, attendance_page, args.institution_type, entries)
+
+    return build_trace('live', args.institution_type, entries, parses, profile, wall_ms)
+
+
+def replay_run(args) -> dict:
+    """Parse saved pages with no network"""
+    login_path = os.path.join(args.pages, 'login.html')
+    attendance_path = os.path.join(args.pages, 'attendance.html')
+    if not os.path.exists(attendance_path):
+        sys.exit(f"{attendance_path} not found - capture pages with: live --save-html {args.pages}")
+
+    login_page = open(login_path, 'rb').read() if os.path.exists(login_path) else b''
+    attendance_page = open(attendance_path, 'rb').read()
+    meta_path = os.path.join(args.pages, 'meta.json')
+    meta = json.load(open(meta_path)) if os.path.exists(meta_path) else {}
+
+    backend.warm_parser()
+    started = time.perf_counter()
+    parses = run_parsers(login_page, attendance_page, args.repeat)
+    wall_ms = (time.perf_counter() - started) * 1000
+    profile = profile_run(lambda: run_parsers(login_page, attendance_page, 1))
+    # Network entries from the capture are kept for reference but not re-timed
+    return build_trace('replay', meta.get('institution_type'), meta.get('entries', []), parses, profile, wall_ms)
+
+
+def save_pages(directory: str, login_page: bytes, attendance_page: bytes, institution_type: str, entries: list) -> None:
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'login.html'), 'wb') as f:
+        f.write(login_page)
+    with open(os.path.join(directory, 'attendance.html'), 'wb') as f:
+        f.write(attendance_page)
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({
+            'captured': datetime.now().isoformat(),
+            'institution_type': institution_type,
+            'entries': [entry for entry in entries if entry['type'] == 'request'],
+        }, f, indent=2)
+    print(f"Saved pages to {directory}/ (contains personal attendance data)")
+
+
+def build_trace(mode: str, institution_type: str, entries: list, parses: list, profile: dict, wall_ms: float) -> dict:
+    requests_ = [entry for entry in entries if entry['type'] == 'request']
+    return {
+        'version': TRACE_VERSION,
+        'mode': mode,
+        'created': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'institution_type': institution_type,
+        'entries': [
+            {
+                'step': entry['step'],
+                'startedDateTime': entry.get('started'),
+                'time': entry['ms'],
+                'request': {'method': entry['method'], 'url': entry['url']},
+                'response': {'status': entry['status'], 'bodySize': entry['bytes'], 'finalUrl': entry['final_url']},
+            }
+            for entry in requests_
+        ],
+        'parse': parses,
+        'totals': {
+            'network_ms': round(sum(entry['ms'] for entry in requests_), 3),
+            'network_bytes': sum(entry['bytes'] for entry in requests_),
+            'parse_ms': round(sum(parse['ms'] for parse in parses), 3),
+            'wall_ms': round(wall_ms, 3),
+            'peak_memory_kb': profile['memory']['peak_kb'],
+        },
+        'profile': profile['profile'],
+        'memory': profile['memory']['top'],
+    }
+
+
+def print_trace(trace: dict) -> None:
+    print(f"=== {trace['mode'].upper()} RUN ({trace['created']}) ===")
+    for entry in trace['entries']:
+        print(f"  {entry['request']['method']:4} {entry['step']:16} {entry['response']['status']} "
+              f"{entry['response']['bodySize']:>8} B {entry['time']:>9.1f} ms")
+    print("=== PARSING ===")
+    for parse in trace['parse']:
+        suffix = f"  ERROR: {parse['error']}" if parse['error'] else ''
+        print(f"  {parse['parser']:28} {parse['bytes']:>8} B {parse['ms']:>9.2f} ms  "
+              f"{parse['result_items']} items{suffix}")
+    print("=== HOT SPOTS (own time) ===")
+    for row in trace['profile'][:10]:
+        print(f"  {row['tottime_ms']:>9.2f} ms {row['calls']:>8} calls  {row['function']} ({row['location']})")
+    totals = trace['totals']
+    print(f"=== TOTALS: network {totals['network_ms']:.1f} ms / {totals['network_bytes']} B, "
+          f"parse {totals['parse_ms']:.1f} ms, wall {totals['wall_ms']:.1f} ms, "
+          f"peak memory {totals['peak_memory_kb']:.0f} KB ===")
+
+
+def compare_traces(args) -> None:
+    before = json.load(open(args.before))
+    after = json.load(open(args.after))
+
+    def row(label, old, new, unit):
+        if old is None or new is None:
+            print(f"  {label:32} {old!s:>10} -> {new!s:>10}")
+            return
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {label:32} {old:>10.2f} -> {new:>10.2f} {unit:3} {change:>8}")
+
+    print(f"=== {args.before} ({before['mode']}) vs {args.after} ({after['mode']}) ===")
+    steps = {entry['step']: entry for entry in before['entries']}
+    for entry in after['entries']:
+        if entry['step'] in steps:
+            row(f"request: {entry['step']}", steps[entry['step']]['time'], entry['time'], 'ms')
+    parsers = {parse['parser']: parse for parse in before['parse']}
+    for parse in after['parse']:
+        if parse['parser'] in parsers:
+            row(f"parse: {parse['parser']}", parsers[parse['parser']]['ms'], parse['ms'], 'ms')
+    for key, unit in (('network_ms', 'ms'), ('parse_ms', 'ms'), ('wall_ms', 'ms'), ('peak_memory_kb', 'KB')):
+        row(f"total: {key}", before['totals'].get(key), after['totals'].get(key), unit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the portal login and attendance extraction")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    live = commands.add_parser('live', help="log in to the real portal")
+    live.add_argument('--username')
+    live.add_argument('--password')
+    live.add_argument('--institution-type', default='college', choices=['college', 'university'])
+    live.add_argument('--deadline', type=float, default=backend.LOGIN_DEADLINE_SECONDS)
+    live.add_argument('--repeat', type=int, default=5, help="runs per parser (median is reported)")
+    live.add_argument('--save-html', metavar='DIR', help="save the pages for offline replay")
+    live.add_argument('--out', help="write the JSON trace here")
+
+    replay = commands.add_parser('replay', help="parse saved pages without network")
+    replay.add_argument('pages', help="directory written by live --save-html")
+    replay.add_argument('--repeat', type=int, default=5, help="runs per parser (median is reported)")
+    replay.add_argument('--out', help="write the JSON trace here")
+
+    compare = commands.add_parser('compare', help="compare two saved traces")
+    compare.add_argument('before')
+    compare.add_argument('after')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        compare_traces(args)
+        return
+
+    trace = live_run(args) if args.command == 'live' else replay_run(args)
+    print_trace(trace)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(trace, f, indent=2)
+        print(f"Trace written to {args.out}")
+
 
 if __name__ == "__main__":
-    result = debug_login_process()
-    print(f"\n=== FINAL RESULT ===")
-    print(json.dumps(result, indent=2))
+    main()
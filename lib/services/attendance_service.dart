@@ -46,6 +46,11 @@ class AttendanceService {
           success: false,
           message: 'Invalid request format. Please check your credentials.',
         );
+      } else if (_serverMessage(response) != null) {
+        return AttendanceResponse(
+          success: false,
+          message: _serverMessage(response)!,
+        );
       } else {
         return AttendanceResponse(
           success: false,
@@ -76,6 +81,23 @@ class AttendanceService {
     }
   }
 
+  // 503 (portal down or server busy) and 504 (portal timed out) responses carry
+  // a message meant for the user, e.g. "Please try again in 30 seconds."
+  static String? _serverMessage(http.Response response) {
+    if (response.statusCode != 503 && response.statusCode != 504) {
+      return null;
+    }
+    try {
+      final jsonData = jsonDecode(response.body);
+      if (jsonData is Map && jsonData['message'] is String) {
+        return jsonData['message'] as String;
+      }
+    } on FormatException {
+      // Not our JSON body (e.g. a Heroku router error page)
+    }
+    return null;
+  }
+
   static Future<bool> checkServerHealth() async {
     try {
       final baseUrl = await _getWorkingBaseUrl();
@@ -198,6 +220,8 @@ class AttendanceService {
               .toList();
         }
         return [];
+      } else if (_serverMessage(response) != null) {
+        throw Exception(_serverMessage(response));
       } else {
         throw Exception(
           'Failed to fetch date-wise attendance: ${response.statusCode}',